@@ -0,0 +1,139 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Path flattening benchmark."""
+
+import os
+import sys
+
+this_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(this_dir, '..', '..'))
+
+# handling args ##############################################################
+
+import getopt
+import textwrap
+
+name, args = sys.argv[0], sys.argv[1:]
+
+DEFAULTS = {
+	"python":   False,
+	"segments": 10000,
+	"repeat":   3,
+}
+
+def exit_usage(message=None, code=0):
+	usage = textwrap.dedent("""\
+	Usage: %(name)s [-hpn:r:]
+		-h --help                 print this help message then exit
+		-p --python               disable the numpy engine
+		-n --segments <count>     number of curved segments (defaults to %(segments)s)
+		-r --repeat <count>       number of runs per scale (defaults to %(repeat)s)
+	""" % dict(name=name, **DEFAULTS))
+	if message:
+		sys.stderr.write("%s\n" % message)
+	sys.stderr.write(usage)
+	sys.exit(code)
+
+try:
+	options, args = getopt.getopt(args, "hpn:r:",
+	                                    ["help", "python",
+	                                     "segments=", "repeat="])
+except getopt.GetoptError as message:
+	exit_usage(message, 1)
+
+python   = DEFAULTS["python"]
+segments = DEFAULTS["segments"]
+repeat   = DEFAULTS["repeat"]
+
+for opt, value in options:
+	if opt in ["-h", "--help"]:
+		exit_usage()
+	elif opt in ["-p", "--python"]:
+		python = True
+	elif opt in ["-n", "--segments"]:
+		segments = int(value)
+	elif opt in ["-r", "--repeat"]:
+		repeat = int(value)
+
+if python:
+	sys.modules["numpy"] = None # makes "import numpy" fail
+
+
+# benchmark ##################################################################
+
+import random
+from timeit import timeit
+
+from seagull import scenegraph as sg
+from seagull.scenegraph.element import path as _path
+from seagull.scenegraph.element._path import _cubic, _lerp
+
+def path_data(n, size=1000., seed=0):
+	"""random path data mixing cubic, quadric and arc segments."""
+	rnd = random.Random(seed)
+	def p():
+		return rnd.uniform(0., size), rnd.uniform(0., size)
+	d = ['M', p()]
+	for i in range(n):
+		d += [
+			['C', p(), p(), p()],
+			['Q', p(), p()],
+			['A', (rnd.uniform(1., size), rnd.uniform(1., size)),
+			      rnd.uniform(0., 360.), (i % 2, (i//2) % 2), p()],
+		][i % 3]
+	d.append('Z')
+	return d
+
+def cubics_data(n, size=1000., seed=0):
+	"""random cubic segments control points."""
+	rnd = random.Random(seed)
+	def p():
+		return rnd.uniform(0., size), rnd.uniform(0., size)
+	return [(p(), p(), p(), p()) for i in range(n)]
+
+
+# former recursive flattening, as a comparison point
+
+_L2_RATIO = 4 # trade-off precision for polygons
+
+def _casteljau(p0, p1, p2, p3, t=.5):
+	"""de Casteljau subdivision of cubic Bézier curve."""
+	p01, p12, p23 = _lerp(p0, p1, t), _lerp(p1, p2, t), _lerp(p2, p3, t)
+	p012, p123 = _lerp(p01, p12, t), _lerp(p12, p23, t)
+	p0123 = _lerp(p012, p123, t)
+	return p01, p12, p23, p012, p123, p0123
+
+def _recursive_cubic(p0, p1, p2, p3, du2):
+	"""cubic Bézier spline flattenization by recursive subdivision."""
+	if (p0, p2) == (p1, p3):
+		return [p3]
+	
+	(x0, y0), (x1, y1), (x2, y2), (x3, y3) = p0, p1, p2, p3
+	d1 = (x3-x0)*(y1-y0) - (y3-y0)*(x1-x0)
+	d2 = (x3-x0)*(y2-y0) - (y3-y0)*(x2-x0)
+	dd03 = (x3-x0)*(x3-x0)+(y3-y0)*(y3-y0)
+	if (d1*d1+d2*d2)*du2 < dd03*_L2_RATIO:
+		return [_lerp(p1, p2), p3]
+	else:
+		p01, p12, p23, p012, p123, p0123 = _casteljau(p0, p1, p2, p3)
+		return _recursive_cubic(p0, p01, p012, p0123, du2) + \
+		       _recursive_cubic(p0123, p123, p23, p3, du2)
+
+d = path_data(segments)
+print("engine: %s" % _path._flatten.__module__)
+print("%i segments" % segments)
+for scale in [.1, 1., 10., 100.]:
+	du2 = scale*scale
+	points = sum(len(path) for path, _, _ in _path._flatten(d, du2))
+	t = timeit(lambda: sg.Path(d=d)._paths(du2), number=repeat) / repeat
+	print("scale %6.1f: %8i points in %.3fs" % (scale, points, t))
+
+cubics = cubics_data(segments)
+print("%i cubic segments" % segments)
+for scale in [.1, 1., 10., 100.]:
+	du2 = scale*scale
+	for name, cubic in [("recursive", _recursive_cubic), ("wang", _cubic)]:
+		points = sum(len(cubic(*c, du2)) for c in cubics)
+		t = timeit(lambda: [cubic(*c, du2) for c in cubics], number=repeat) / repeat
+		print("scale %6.1f: %-9s %8i points in %.3fs" % (scale, name, points, t))
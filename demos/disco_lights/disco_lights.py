@@ -28,7 +28,7 @@ with open(os.path.join(this_dir, "rgb_lights.svg")) as f:
     #sys.stdout.write(serialize(svg))
     #sys.stdout.write("elements = %s\n" % (elements,))
 
-(x_min, y_min), (x_max, y_max) = svg.aabbox()
+(x_min, y_min), (x_max, y_max) = svg.aabbox(exact=False)
 window_size = int(x_max-x_min+2*margin), int(y_max-y_min+2*margin)
 
 scene = sg.Use(svg, transform=[sg.Translate(margin-x_min, margin-y_min)])
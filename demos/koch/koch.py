@@ -42,6 +42,7 @@ def koch(n, k0=sg.Line(x2=100)):
 		stroke_width=.05*3**n,
 		stroke_linecap="round",
 		children=[_koch(n, k0)],
+		batched=True, # lines drawn instanced
 	)
 
 n = 6
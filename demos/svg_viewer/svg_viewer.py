@@ -21,18 +21,26 @@ DEFAULTS = {
 	"fast":    False,
 	"time":    False,
 	"profile": False,
+	"background": False,
+	"curves":  False,
+	"extruded": False,
+	"batched": False,
 	"toolkit": "glut",
 	"margin":  20,
 }
 
 def exit_usage(message=None, code=0):
 	usage = textwrap.dedent("""\
-	Usage: %(name)s [-hftpk:m:] <doc.svg>
+	Usage: %(name)s [-hcftpbqegk:m:] <doc.svg>
 		-h --help                       print this help message then exit
 		-c --core                       enable gl core profile use
 		-f --fast                       disable gl error checking
 		-t --time                       time gl display performance
 		-p --profile                    profile gl display
+		-b --background                 tessellate in background threads
+		-q --curves                     fill curves in shaders, at any scale
+		-e --extruded                   apply strokes width in shaders
+		-g --batched                    draw groups through retained batches
 		-k --toolkit [glut|qt5|pyglet]  choose toolkit (defaults to %(toolkit)r)
 		-m --margin <size>              add a margin (defaults to %(margin)s)
 		[doc.svg]                       file to show (if omitted, reads on stdin)
@@ -43,9 +51,11 @@ def exit_usage(message=None, code=0):
 	sys.exit(code)
 
 try:
-	options, args = getopt.getopt(args, "hcftpk:m:",
+	options, args = getopt.getopt(args, "hcftpbqegk:m:",
 	                                    ["help",
 	                                     "core", "fast", "time", "profile",
+	                                     "background", "curves", "extruded",
+	                                     "batched",
 	                                     "toolkit=", "margin="])
 except getopt.GetoptError as message:
 	exit_usage(message, 1)
@@ -54,6 +64,10 @@ core    = DEFAULTS["core"]
 fast    = DEFAULTS["fast"]
 time    = DEFAULTS["time"]
 profile = DEFAULTS["profile"]
+background = DEFAULTS["background"]
+curves  = DEFAULTS["curves"]
+extruded = DEFAULTS["extruded"]
+batched = DEFAULTS["batched"]
 toolkit = DEFAULTS["toolkit"]
 margin  = DEFAULTS["margin"]
 
@@ -68,6 +82,14 @@ for opt, value in options:
 		time = True
 	elif opt in ["-p", "--profile"]:
 		profile = True
+	elif opt in ["-b", "--background"]:
+		background = True
+	elif opt in ["-q", "--curves"]:
+		curves = True
+	elif opt in ["-e", "--extruded"]:
+		extruded = True
+	elif opt in ["-g", "--batched"]:
+		batched = True
 	elif opt in ["-k", "--toolkit"]:
 		toolkit = value
 		if toolkit not in ["glut", "qt5", "pyglet"]:
@@ -115,7 +137,7 @@ from seagull.opengl.utils import gl_prepare, gl_reshape, gl_display
 
 svg, elems = parse(svg)
 
-(x_min, y_min), (x_max, y_max) = svg.aabbox()
+(x_min, y_min), (x_max, y_max) = svg.aabbox(exact=False)
 window_size = int(x_max-x_min+2*margin), int(y_max-y_min+2*margin)
 
 scene = sg.Use(svg, transform=[sg.Translate(margin-x_min, margin-y_min)])
@@ -161,6 +183,26 @@ if profile:
 if time:
 	gl_display = timing(gl_display)
 
+if curves:
+	sg.Path.curve_fills = True
+
+if extruded:
+	sg.Path.extruded_strokes = True
+
+if batched:
+	sg.Group.batched = True
+
+if background:
+	sg.tessellator.start()
+	def refining(f):
+		"""redisplay until background tessellation is done"""
+		def refined(*args, **kwargs):
+			f(*args, **kwargs)
+			if sg.tessellator.pending:
+				post_redisplay()
+		return refined
+	gl_display = refining(gl_display)
+
 
 # screenshot #################################################################
 
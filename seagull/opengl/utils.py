@@ -6,8 +6,10 @@ OpenGL utilities
 
 # imports ####################################################################
 
+from ctypes import sizeof
 from struct import pack
 from math import floor, ceil
+from threading import current_thread
 
 from . import gl as _gl
 
@@ -206,7 +208,13 @@ class OffscreenContext:
 # vertex buffer objects ######################################################
 
 def _c_array(points):
-	"""turn list of 2-tuple into c array of floats."""
+	"""turn list of 2-tuple (or numpy array) into c array of floats."""
+	try:
+		points = points.astype("float32")
+	except AttributeError:
+		pass
+	else:
+		return len(points), points.tobytes()
 	n = len(points)
 	try:
 		s = len(points[0])
@@ -214,21 +222,51 @@ def _c_array(points):
 		return n, pack("%df" % n, *points)
 	return n, pack("%df" % (s*n), *(u for point in points for u in point))
 
+_orphan_vbo_ids = [] # released out of the thread owning the gl context
+
 class _vbo_id(int):
-	"""auto releasing vbo id"""
+	"""auto releasing vbo id
+	
+	ids released by another thread than the one that created them are
+	deleted at next vbo creation.
+	"""
 	def __del__(self):
 		try:
+			if current_thread() is not self.thread:
+				_orphan_vbo_ids.append(int(self))
+				return
 			_gl.DeleteBuffers(1, (_gl.uint*1)(self))
 		except (AttributeError, TypeError):
 			pass
 
-def create_vbo(points):
-	n, vertices = _c_array(points)
+def _delete_orphan_vbos():
+	n = len(_orphan_vbo_ids)
+	if n:
+		vbo_ids, _orphan_vbo_ids[:n] = _orphan_vbo_ids[:n], []
+		_gl.DeleteBuffers(n, (_gl.uint*n)(*vbo_ids))
+
+def create_vbo(*arrays):
+	"""(n, vbo id) of arrays of points put one after the other."""
+	_delete_orphan_vbos()
+	n, vertices = 0, []
+	for points in arrays:
+		m, data = _c_array(points)
+		n += m
+		vertices.append(data)
+	vertices = b"".join(vertices)
 	vbo_id = _vbo_id(_gl.GenBuffers(1))
+	vbo_id.thread = current_thread()
 	_gl.BindBuffer(_gl.ARRAY_BUFFER, vbo_id)
 	_gl.BufferData(_gl.ARRAY_BUFFER, vertices, _gl.STATIC_DRAW)
 	return n, vbo_id
 
+def update_vbo(vbo_id, first, points):
+	"""overwrite vbo from its point of index first (points as in create_vbo)."""
+	n, data = _c_array(points)
+	if n:
+		_gl.BindBuffer(_gl.ARRAY_BUFFER, vbo_id)
+		_gl.BufferSubData(_gl.ARRAY_BUFFER, first*(len(data)//n), data)
+
 
 # shaders ####################################################################
 
@@ -295,12 +333,39 @@ _Uniforms = {
 	(1, _gl.int):   _gl.Uniform1iv,
 }
 
+_storages = {} # (program, uniform) -> c array
+
 def set_uniform(program, uniform, values):
+	"""set uniform of program, through c storage preallocated per uniform."""
 	v0, n = values[0], len(values)
 	if isinstance(v0, tuple):
 		l, t = len(v0), _c_types[type(v0[0])]
-		values = (t * (l*n))(*(u for value in values for u in value))
+		values = [u for value in values for u in value]
 	else:
 		l, t = 1, _c_types[type(v0)]
-		values = (t * n)(*values)
-	_Uniforms[l, t](location(program, uniform), n, values)
+	key = program, uniform
+	try:
+		storage = _storages[key]
+	except KeyError:
+		storage = None
+	if storage is None or len(storage) != l*n or storage._type_ is not t:
+		storage = _storages[key] = (t * (l*n))()
+	storage[:] = values
+	_Uniforms[l, t](location(program, uniform), n, storage)
+
+
+# uniform buffer objects #####################################################
+
+def create_ubo(size, binding):
+	"""uniform buffer of size bytes, bound to binding point."""
+	ubo_id = _vbo_id(_gl.GenBuffers(1))
+	ubo_id.thread = current_thread()
+	_gl.BindBuffer(_gl.UNIFORM_BUFFER, ubo_id)
+	_gl.BufferData(_gl.UNIFORM_BUFFER, size, None, _gl.DYNAMIC_DRAW)
+	_gl.BindBufferBase(_gl.UNIFORM_BUFFER, binding, ubo_id)
+	return ubo_id
+
+def update_ubo(ubo_id, storage):
+	"""copy c storage to the start of uniform buffer."""
+	_gl.BindBuffer(_gl.UNIFORM_BUFFER, ubo_id)
+	_gl.BufferSubData(_gl.UNIFORM_BUFFER, 0, sizeof(storage), storage)
@@ -7,4 +7,7 @@ from .transform import Translate, Scale, Rotate, SkewX, SkewY, Matrix
 from .element import (Element, Use, Group, Path,
                       Rectangle, Circle, Ellipse,
                       Line, Polyline, Polygon,
-                      Text, Image)
+                      Text, Image, Markers)
+from .element._cache import cache_manager
+from .element._tessellator import tessellator
+from .element.path import tessellate
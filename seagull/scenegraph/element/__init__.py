@@ -6,7 +6,7 @@ scenegraph.element
 
 # imports ####################################################################
 
-from weakref import WeakValueDictionary as _weakdict
+from weakref import WeakValueDictionary as _weakdict, ref as _ref
 
 from ...opengl.utils import OffscreenContext
 from .._common import _Element
@@ -69,6 +69,84 @@ _INHERITEDS = {
 }
 
 
+class _NotifyingList(list):
+	"""list calling _modified with added and removed items on changes."""
+	
+	def _modified(self, added=(), removed=()):
+		raise NotImplementedError
+	
+	def append(self, item):
+		super(_NotifyingList, self).append(item)
+		self._modified([item])
+	
+	def insert(self, index, item):
+		super(_NotifyingList, self).insert(index, item)
+		self._modified([item])
+	
+	def extend(self, items):
+		items = list(items)
+		super(_NotifyingList, self).extend(items)
+		self._modified(items)
+	
+	def __iadd__(self, items):
+		self.extend(items)
+		return self
+	
+	def __setitem__(self, index, items):
+		if isinstance(index, slice):
+			items = list(items)
+			added, removed = items, self[index]
+		else:
+			added, removed = [items], [self[index]]
+		super(_NotifyingList, self).__setitem__(index, items)
+		self._modified(added, removed)
+	
+	def __delitem__(self, index):
+		removed = self[index] if isinstance(index, slice) else [self[index]]
+		super(_NotifyingList, self).__delitem__(index)
+		self._modified((), removed)
+	
+	def remove(self, item):
+		super(_NotifyingList, self).remove(item)
+		self._modified((), [item])
+	
+	def pop(self, index=-1):
+		item = super(_NotifyingList, self).pop(index)
+		self._modified((), [item])
+		return item
+	
+	def clear(self):
+		removed = list(self)
+		super(_NotifyingList, self).clear()
+		self._modified((), removed)
+	
+	def sort(self, *args, **kwargs):
+		super(_NotifyingList, self).sort(*args, **kwargs)
+		self._modified()
+	
+	def reverse(self):
+		super(_NotifyingList, self).reverse()
+		self._modified()
+
+
+class _Transforms(_NotifyingList):
+	"""transforms list of an element, invalidated on changes.
+	
+	transforms themselves are not watched, replace them to modify them.
+	"""
+	
+	def __init__(self, element, transforms=()):
+		super(_Transforms, self).__init__(transforms)
+		self._element = _ref(element)
+	
+	def _modified(self, added=(), removed=()):
+		element = self._element()
+		if element is not None:
+			element._invalidate()
+
+
+_AABBOX_CACHE_SIZE = 16 # transforms cached per element
+
 class Element(_Element):
 	x, y = 0, 0
 	transform = None
@@ -82,6 +160,10 @@ class Element(_Element):
 		"opacity", "clip_path", "mask"
 	]
 	
+	_parents = ()
+	_valid = False
+	_derived = {}
+	
 	def __init__(self, **attributes):
 		self._attributes = set()
 		self._inheriteds = _INHERITEDS
@@ -93,12 +175,18 @@ class Element(_Element):
 	def __setattr__(self, attribute, value):
 		if attribute in _ATTRIBUTES:
 			self._attributes.add(attribute)
+		if attribute == "transform" and value is not None:
+			value = _Transforms(self, value)
 		super(Element, self).__setattr__(attribute, value)
+		if not attribute.startswith("_"):
+			self._invalidate()
 
 	def __delattr__(self, attribute):
 		super(Element, self).__delattr__(attribute)
 		if attribute in _ATTRIBUTES:
 			self._attributes.remove(attribute)
+		if not attribute.startswith("_"):
+			self._invalidate()
 	
 	def __getattr__(self, attribute):
 		if attribute in _INHERITEDS:
@@ -112,6 +200,39 @@ class Element(_Element):
 		self._inheriteds = inheriteds
 		return {attr: getattr(self, attr) for attr in _INHERITEDS}
 	
+	def _inherited_values(self):
+		return tuple(getattr(self, attr) for attr in _INHERITEDS)
+	
+	
+	# invalidation
+	
+	def _link(self, parent):
+		"""register parent as depending on self."""
+		if not any(p() is parent for p in self._parents):
+			self._parents = [p for p in self._parents if p() is not None]
+			self._parents.append(_ref(parent))
+	
+	def _unlink(self, parent):
+		"""unregister parent as depending on self."""
+		self._parents = [p for p in self._parents
+		                 if p() is not None and p() is not parent]
+	
+	def _validate(self):
+		"""drop data derived before self (or a descendant) changed."""
+		if not self._valid:
+			self._derived = {}
+			self._valid = True
+	
+	def _invalidate(self):
+		"""mark data derived by self and its ancestors as outdated."""
+		if not self._valid:
+			return # ancestors are already invalid
+		self._valid = False
+		for parent in self._parents:
+			parent = parent()
+			if parent is not None:
+				parent._invalidate()
+	
 	@property
 	def id(self):
 		self._attributes.add("id")
@@ -130,13 +251,38 @@ class Element(_Element):
 	
 	# axis-aligned bounding box
 	
-	def aabbox(self, transform=Matrix(), inheriteds=_INHERITEDS):
+	def aabbox(self, transform=Matrix(), inheriteds=_INHERITEDS, exact=True):
+		"""axis aligned bounding box in transform coordinates.
+		
+		if not exact, a conservative (larger) box is computed from path control
+		points and stroke widths, without flattening nor stroking anything.
+		"""
 		inheriteds = self._inherit(inheriteds)
-		return self._aabbox(transform*self.matrix(), inheriteds)
+		transform = transform*self.matrix()
+		
+		self._validate()
+		cache = self._derived.setdefault("aabbox", {})
+		key, values = (transform.abcdef, exact), tuple(inheriteds.values())
+		try:
+			cached_values, bbox = cache[key]
+		except KeyError:
+			pass
+		else:
+			if cached_values == values:
+				return bbox
+		if len(cache) >= _AABBOX_CACHE_SIZE:
+			cache.clear()
+		bbox = self._aabbox(transform, inheriteds, exact)
+		cache[key] = values, bbox
+		return bbox
 	
-	def _aabbox(self, transform, inheriteds):
+	def _aabbox(self, transform, inheriteds, exact=True):
 		raise NotImplementedError
 	
+	def _local_hull(self, du2, inheriteds):
+		"""convex hull in local coordinates (None if unknown)."""
+		return None
+	
 	def _units(self, elem, attr, default="userSpaceOnUse"):
 		units = getattr(elem, attr, default)
 		if units == "userSpaceOnUse":
@@ -214,6 +360,70 @@ class Element(_Element):
 		
 	def _pick_content(self, x, y, transform):
 		return []
+	
+	def pick_many(self, points, transform=Matrix()):
+		"""picks of all points, in a single traversal of the tree."""
+		transform = transform*self.matrix()
+		hits = self._hit_test_many(points, transform)
+		contents = self._pick_content_many(points, transform)
+		return [point_hits + [([self] + e, p) for e, p in content]
+		        for point_hits, content in zip(hits, contents)]
+	
+	def _hit_test_many(self, points, transform):
+		return [self._hit_test(x, y, transform) for x, y in points]
+	
+	def _pick_content_many(self, points, transform):
+		return [self._pick_content(x, y, transform) for x, y in points]
+	
+	def pick_region(self, region, transform=Matrix(), contained=False):
+		"""elements intersecting (or contained in) region.
+		
+		region is a polygon given by its points (two points being the opposite
+		corners of a rectangle), elements are returned as paths from self.
+		"""
+		if len(region) == 2:
+			(x0, y0), (x1, y1) = region
+			region = [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+		transform = transform*self.matrix()
+		hits = [[self]] if self._region_test(region, transform, contained) else []
+		hits += [[self] + e for e in self._pick_region_content(region, transform,
+		                                                       contained)]
+		return hits
+	
+	def _region_test(self, region, transform, contained):
+		return False
+	
+	def _pick_region_content(self, region, transform, contained):
+		return []
+	
+	def _local_bounds(self, du2):
+		"""conservative bbox for picking in local coordinates (None if unknown)."""
+		return None
+	
+	
+	# batching
+	
+	def _draws_content(self, inheriteds, du2):
+		"""spans of draws of content in local coordinates (None if not
+		batchable).
+		
+		spans are (abcdef, draws) with draws moved to local coordinates by
+		abcdef. draws are (kind, color, alpha, points, cover, abcdef) tuples,
+		and (None, element, transform, inheriteds) for elements to render on
+		their own. du2 is the surface of a pixel in local coordinates.
+		"""
+		return None
+	
+	
+	# tessellation
+	
+	def _tessellables(self, transform=Matrix(), inheriteds=_INHERITEDS):
+		"""paths to tessellate, with their transform and inheriteds."""
+		inheriteds = self._inherit(inheriteds)
+		return self._tessellables_content(transform*self.matrix(), inheriteds)
+	
+	def _tessellables_content(self, transform, inheriteds):
+		return []
 
 
 # elements ###################################################################
@@ -229,3 +439,4 @@ from .polygon import Polygon
 from .path import Path
 from .text import Text
 from .image import Image
+from .markers import Markers
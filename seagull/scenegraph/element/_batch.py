@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+
+"""
+retained batches of paths geometry, drawn in few gl calls in painter's order
+(repeated geometries being drawn instanced)
+"""
+
+
+# imports ####################################################################
+
+from ...opengl import gl as _gl
+from ...opengl.utils import get_opengl_version, create_vbo
+from ..paint import Color, _Paint
+from ..transform import Matrix
+from ._path import _bbox
+from .path import _IDENTITY, _du2, _projections, _colored_projections, \
+                   _covered_vbo
+from ._bvh import _cached, _grid, _grid_add, _grid_overlaps
+
+
+# draws ######################################################################
+
+def _composed(abcdef0, abcdef):
+	"""abcdef of the matrix product."""
+	a0, b0, c0, d0, e0, f0 = abcdef0
+	a, b, c, d, e, f = abcdef
+	return (a0*a+c0*b, b0*a+d0*b, a0*c+c0*d, b0*c+d0*d,
+	        a0*e+c0*f+e0, b0*e+d0*f+f0)
+
+def _projected_draws(abcdef, draws):
+	"""draws moved to parent coordinates by abcdef."""
+	if abcdef == _IDENTITY:
+		return draws
+	return [(kind, color, alpha, points, cover, _composed(abcdef, draw_abcdef))
+	        for kind, color, alpha, points, cover, draw_abcdef in draws]
+
+def _projected_spans(matrix, spans):
+	"""spans moved to parent coordinates by matrix."""
+	abcdef0 = matrix.abcdef
+	if abcdef0 == _IDENTITY:
+		return spans
+	return [(_composed(abcdef0, abcdef), draws) for abcdef, draws in spans]
+
+def _content_draws(element, inheriteds, du2):
+	"""spans of draws of element content, cached by scale level.
+	
+	du2 is the surface of a pixel in element coordinates.
+	"""
+	def draws():
+		return element._draws_content(inheriteds, du2)
+	element._validate()
+	return _cached(element._derived.setdefault("draws", {}), element, du2, draws)
+
+def _draws(element, inheriteds, du2):
+	"""spans of draws of element in parent coordinates, in painter's order.
+	
+	spans are (abcdef, draws), where draws are the cached draws of a path
+	(or of an element to render on its own) and abcdef moves them to parent
+	coordinates. a change thus only recomputes the draws of the changed
+	element and the spans of its ancestors, the draws of unchanged paths
+	being reused as such. du2 is the surface of a pixel in parent
+	coordinates.
+	"""
+	alone = [(_IDENTITY, [(None, element, Matrix(), inheriteds)])]
+	if element.clip_path or element.mask or element.opacity < 1.:
+		return alone
+	inheriteds = element._inherit(inheriteds)
+	matrix = element.matrix()
+	spans = _content_draws(element, inheriteds, du2*_du2(matrix))
+	if spans is None:
+		return alone
+	return _projected_spans(matrix, spans)
+
+
+# runs #######################################################################
+
+_GRID_SIZE = 64  # cells along the largest side of the batched covers
+_LOOKBACK  = 8   # runs a draw may move back over
+_RUN_SIZE  = 256 # draws per run, bounding what a change packs again
+
+_INSTANCES          = 8    # draws of a same geometry from which to instance
+_INSTANCES_LOOKBACK = 64   # runs an instance may move back over (text glyphs)
+_INSTANCES_SIZE     = 4096 # instances per run
+
+def _box(draw):
+	"""bbox of the cover of draw (None for elements)."""
+	if draw[0] is None:
+		return None
+	_, _, _, _, cover, abcdef = draw
+	return _bbox([_projections(abcdef, cover)])
+
+def _cell(boxes):
+	"""size of overlap grid cells, from the extent of boxes."""
+	corners = [p for box in boxes if box is not None for p in box]
+	if not corners:
+		return 1.
+	(x_min, y_min), (x_max, y_max) = _bbox([corners])
+	return max(x_max-x_min, y_max-y_min)/_GRID_SIZE or 1.
+
+def _kind_key(draw):
+	"""draws of a kind are packed together, only triangles may overlap."""
+	kind = draw[0]
+	if kind == "instances":
+		return None, False
+	return kind, kind == "triangles"
+
+def _instance_key(draw):
+	"""draws of a geometry and paint are instanced together, opaque strokes
+	may also overlap as their stencil only counts coverage."""
+	kind, color, alpha, points, _, _ = draw
+	return (kind, id(points), id(color), alpha), \
+	       kind == "triangles" or (kind == "one" and alpha >= 1.)
+
+def _runs(items, cell, key, lookback, size):
+	"""(key, items) runs merging (draw, box) items of the same key.
+	
+	key(draw) is (key, overlapping). a draw joins one of the last runs of its
+	key when it does not overlap the draws of the runs after it, so that
+	painting the runs gives the same result as painting the draws one after
+	the other. unless overlapping, it must also be disjoint from the draws of
+	its run, as the stencil passes of a run are done at once. draws with a
+	None key are kept on their own, and elements to render on their own (with
+	a None box) are never moved over.
+	"""
+	runs = []
+	for item in items:
+		draw, box = item
+		if box is None:
+			runs.append((None, [item], None))
+			continue
+		draw_key, overlapping = key(draw)
+		target = None
+		for run in reversed(runs[-lookback:] if draw_key is not None else []):
+			run_key, run_items, grid = run
+			if grid is None:
+				break
+			overlaps = _grid_overlaps(grid, box)
+			if run_key == draw_key and len(run_items) < size and \
+			   (overlapping or not overlaps):
+				target = run
+				break
+			if overlaps:
+				break
+		if target is None:
+			target = draw_key, [], _grid(cell)
+			runs.append(target)
+		_, run_items, grid = target
+		run_items.append(item)
+		_grid_add(grid, box)
+	return [run[:2] for run in runs]
+
+_instanced = None # opengl >= 3.3, known at first use
+
+def _instancing():
+	"""whether instanced drawing is available (attribute divisors)."""
+	global _instanced
+	if _instanced is None:
+		_instanced = get_opengl_version() >= (3, 3)
+	return _instanced
+
+def _grouped(draws):
+	"""elements, ("instances", draws) and (kind, draws) runs of draws.
+	
+	with instancing, runs of at least _INSTANCES draws of a same geometry
+	(so of a same scale level) and paint are formed first, the remaining
+	draws being packed by kind around them.
+	"""
+	items = [(draw, _box(draw)) for draw in draws]
+	cell = _cell(box for _, box in items)
+	
+	if _instancing():
+		instanced = []
+		for key, run in _runs(items, cell, _instance_key,
+		                      _INSTANCES_LOOKBACK, _INSTANCES_SIZE):
+			if key is None or len(run) < _INSTANCES:
+				instanced += run
+				continue
+			box = _bbox([[p for _, box in run for p in box]])
+			instanced.append((("instances", [draw for draw, _ in run]), box))
+		items = instanced
+	
+	grouped = []
+	for kind, run in _runs(items, cell, _kind_key, _LOOKBACK, _RUN_SIZE):
+		if kind is None:
+			grouped += [draw for draw, _ in run]
+		else:
+			grouped.append((kind, [draw for draw, _ in run]))
+	return grouped
+
+
+# batches ####################################################################
+
+def _batch(kind, draws):
+	"""(kind, ((firsts, counts, n, m), vbo id), draws) batch of a run.
+	
+	vertices of all draws, projected and colored, are followed by the m
+	vertices of their cover triangles (none for triangles, drawn in a single
+	pass). draws are kept with the batch, so that the geometry their key
+	identifies stays alive.
+	"""
+	vertices, covers = [], []
+	firsts, counts, n = [], [], 0
+	for _, color, alpha, points, cover, abcdef in draws:
+		rgba = (*color.rgb, float(alpha))
+		vertices.append(_colored_projections(abcdef, points, rgba))
+		firsts.append(n)
+		counts.append(len(points))
+		n += len(points)
+		if kind != "triangles":
+			p0, p1, p2, p3 = cover # strip order
+			covers.append(_colored_projections(abcdef, [p0, p1, p2, p2, p1, p3],
+			                                   rgba))
+	m = 6*len(covers)
+	_, vbo_id = create_vbo(*vertices, *covers)
+	firsts = (_gl.int * len(firsts))(*firsts)
+	counts = (_gl.int * len(counts))(*counts)
+	return kind, ((firsts, counts, n, m), vbo_id), draws
+
+def _instanced_batch(draws, geometries):
+	"""("instances", (kind, color, alpha, data), draws) batch of a run.
+	
+	the geometry shared by draws is stored with its cover quad once per
+	compilation, and data refers to it along with the instance transforms.
+	"""
+	kind, color, alpha, points, cover, _ = draws[0]
+	try:
+		n, vbo_id = geometries[id(points)]
+	except KeyError:
+		n, vbo_id = geometries[id(points)] = _covered_vbo(points, cover)
+	count, instances_id = create_vbo([(a, c, e, b, d, f, 1., 1., 1., 1.)
+	                                  for *_, (a, b, c, d, e, f) in draws])
+	data = (n, count), (vbo_id, instances_id, 0)
+	return "instances", (kind, color, alpha, data), draws
+
+# chunks #####################################################################
+
+_CHUNKS         = 8    # chunks a group is cut in, a change grouping one again
+_CHUNK_MIN_SIZE = 32   # draws per chunk, bounding the batches chunks add
+_CHUNK_MAX_SIZE = 1024 # draws per chunk, bounding what a change groups again
+
+def _chunks(spans):
+	"""consecutive spans grouped and packed on their own.
+	
+	chunks gather spans up to a power of two draws, so that about _CHUNKS
+	chunks are formed (more for large groups), and elements to render on
+	their own are chunks of their own. boundaries only depend on the draws
+	counts: a change keeping them (e.g. a color, a transform or a path) only
+	groups its chunk again, while other changes group again the chunks after
+	them.
+	"""
+	total = sum(len(draws) for _, draws in spans)
+	size = 1 << (total//_CHUNKS).bit_length()
+	size = min(max(size, _CHUNK_MIN_SIZE), _CHUNK_MAX_SIZE)
+	chunks, chunk, n = [], [], 0
+	for span in spans:
+		_, draws = span
+		alone = draws[0][0] is None
+		if chunk and (alone or n >= size):
+			chunks.append(chunk)
+			chunk, n = [], 0
+		chunk.append(span)
+		n += len(draws)
+		if alone:
+			chunks.append(chunk)
+			chunk, n = [], 0
+	if chunk:
+		chunks.append(chunk)
+	return chunks
+
+def _packed_chunk(chunk, geometries):
+	"""(chunk, batches, colors) of a chunk, with the colors batches bake."""
+	draws = [draw for abcdef, span_draws in chunk
+	              for draw in _projected_draws(abcdef, span_draws)]
+	batches = []
+	for kind, run_draws in _grouped(draws):
+		if kind == "instances":
+			batches.append(_instanced_batch(run_draws, geometries))
+		else:
+			batches.append(_batch(kind, run_draws))
+	colors = {id(draw[1]): draw[1] for draw in draws}
+	return chunk, batches, [(color, color.rgb) for color in colors.values()]
+
+def _compiled(group, inheriteds, du2):
+	"""batches of group children, with the colors they bake.
+	
+	chunks whose spans did not change since the last compilation (nor the
+	colors they bake) are reused, only changed chunks are grouped and
+	packed again.
+	"""
+	spans = _content_draws(group, inheriteds, du2) or []
+	
+	packed, group._packed = group._packed, {}
+	geometries = {}
+	batches, colors = [], []
+	for chunk in _chunks(spans):
+		abcdef, draws = chunk[0]
+		if draws[0][0] is None:
+			_, element, transform, element_inheriteds = draws[0]
+			batches.append((None, element, Matrix(*abcdef)*transform,
+			                element_inheriteds))
+			continue
+		# spans keep their draws alive, so that their ids identify them
+		key = tuple((abcdef, id(draws)) for abcdef, draws in chunk)
+		chunk_packed = packed.get(key)
+		if chunk_packed is None or \
+		   any(color.rgb != rgb for color, rgb in chunk_packed[2]):
+			chunk_packed = _packed_chunk(chunk, geometries)
+		group._packed[key] = chunk_packed
+		_, chunk_batches, chunk_colors = chunk_packed
+		batches += [batch[:2] for batch in chunk_batches]
+		colors += chunk_colors
+	return batches, colors
+
+
+# rendering ##################################################################
+
+_PAINTS = {
+	"triangles": _Paint.paint_batch_triangles,
+	"one":       _Paint.paint_batch_one,
+	"evenodd":   _Paint.paint_batch_evenodd,
+	"nonzero":   _Paint.paint_batch_nonzero,
+}
+
+_INSTANCED_PAINTS = {
+	"triangles": _Paint.paint_instanced_triangles,
+	"one":       _Paint.paint_instanced_one,
+	"evenodd":   _Paint.paint_instanced_evenodd,
+	"nonzero":   _Paint.paint_instanced_nonzero,
+}
+
+_white = Color(1., 1., 1.)
+_unit_bbox = (0., 0.), (1., 1.)
+
+def _render_batches(group, transform, inheriteds, context):
+	"""render group children through batches cached by scale level.
+	
+	batches are compiled again when the group (or a descendant) changes, or
+	when a color they bake is changed in place.
+	"""
+	du2 = _du2(transform)
+	def compiled():
+		return _compiled(group, inheriteds, du2)
+	group._validate()
+	cache = group._derived.setdefault("batches", {})
+	batches, colors = _cached(cache, group, du2, compiled)
+	if any(color.rgb != rgb for color, rgb in colors):
+		cache.clear()
+		batches, colors = _cached(cache, group, du2, compiled)
+	
+	for batch in batches:
+		if batch[0] is None:
+			_, element, element_transform, element_inheriteds = batch
+			element.render(transform*element_transform, element_inheriteds,
+			               context)
+		elif batch[0] == "instances":
+			_, (kind, color, alpha, data) = batch
+			_INSTANCED_PAINTS[kind](color, alpha, data, transform, context,
+			                        (0., 0.), _unit_bbox)
+		else:
+			kind, data = batch
+			_PAINTS[kind](_white, 1., data, transform, context, (0., 0.),
+			              _unit_bbox)
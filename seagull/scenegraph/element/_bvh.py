@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+
+"""
+bounding volumes of elements: conservative boxes and their hierarchy for
+picking, convex hulls for exact bounding boxes
+"""
+
+
+# imports ####################################################################
+
+from collections import defaultdict
+from itertools import chain
+from math import floor
+
+from ._path import INF, _bbox
+from .path import _scale_index, _du2, _projections, _hull
+
+
+# boxes ######################################################################
+
+def _empty(box):
+	(x_min, y_min), (x_max, y_max) = box
+	return x_min > x_max or y_min > y_max
+
+def _contains(box, x, y):
+	(x_min, y_min), (x_max, y_max) = box
+	return (x_min <= x <= x_max) and (y_min <= y <= y_max)
+
+def _overlap(box0, box1):
+	(x_min0, y_min0), (x_max0, y_max0) = box0
+	(x_min1, y_min1), (x_max1, y_max1) = box1
+	return (x_min0 <= x_max1 and x_min1 <= x_max0 and
+	        y_min0 <= y_max1 and y_min1 <= y_max0)
+
+def _transformed(transform, box):
+	"""bbox of transformed box."""
+	if box is None or _empty(box):
+		return box
+	(x_min, y_min), (x_max, y_max) = box
+	return _bbox([[transform.project(x_min, y_min), transform.project(x_max, y_min),
+	               transform.project(x_max, y_max), transform.project(x_min, y_max)]])
+
+
+# overlaps ###################################################################
+
+_GRID_SPAN = 8 # cells along a box side beyond which it is tested one by one
+
+def _grid(cell):
+	"""empty (cell size, cells, large boxes, boxes) grid for overlap tests."""
+	return cell, defaultdict(list), [], []
+
+def _grid_cells(cell, box):
+	"""keys of cells box overlaps (None if too many)."""
+	(x_min, y_min), (x_max, y_max) = box
+	i_min, i_max = int(floor(x_min/cell)), int(floor(x_max/cell))
+	j_min, j_max = int(floor(y_min/cell)), int(floor(y_max/cell))
+	if i_max-i_min >= _GRID_SPAN or j_max-j_min >= _GRID_SPAN:
+		return None
+	return [(i, j) for i in range(i_min, i_max+1) for j in range(j_min, j_max+1)]
+
+def _grid_add(grid, box):
+	cell, cells, large, boxes = grid
+	boxes.append(box)
+	keys = _grid_cells(cell, box)
+	if keys is None:
+		large.append(box)
+	else:
+		for key in keys:
+			cells[key].append(box)
+
+def _grid_overlaps(grid, box):
+	"""whether box overlaps a box of grid."""
+	cell, cells, large, boxes = grid
+	keys = _grid_cells(cell, box)
+	if keys is None:
+		candidates = boxes
+	else:
+		candidates = chain(large, (b for key in keys for b in cells.get(key, ())))
+	return any(_overlap(box, b) for b in candidates)
+
+
+# hierarchy ##################################################################
+
+_LEAF_SIZE = 4
+
+def _node(items):
+	"""(box, indices, left, right) node, leaves have indices."""
+	box = _bbox([[p for b, _ in items for p in b]])
+	if len(items) <= _LEAF_SIZE:
+		return box, sorted(i for _, i in items), None, None
+	(x_min, y_min), (x_max, y_max) = box
+	axis = 0 if x_max-x_min >= y_max-y_min else 1
+	items = sorted(items, key=lambda item: item[0][0][axis]+item[0][1][axis])
+	middle = len(items)//2
+	return box, None, _node(items[:middle]), _node(items[middle:])
+
+def _hierarchy(boxes):
+	"""bvh over boxes (None boxes are unbounded, empty ones never hit)."""
+	items, unbounded = [], []
+	for i, box in enumerate(boxes):
+		if box is None:
+			unbounded.append(i)
+		elif not _empty(box):
+			items.append((box, i))
+	root = _node(items) if items else None
+	return root, unbounded
+
+def _query(hierarchy, x, y):
+	"""ordered indices of boxes containing (x, y)."""
+	root, indices = hierarchy
+	indices = list(indices)
+	nodes = [root] if root is not None else []
+	while nodes:
+		box, leaves, left, right = nodes.pop()
+		if not _contains(box, x, y):
+			continue
+		if leaves is None:
+			nodes += [left, right]
+		else:
+			indices += leaves
+	return sorted(indices)
+
+def _query_box(hierarchy, box):
+	"""ordered indices of boxes (may) intersecting box."""
+	root, indices = hierarchy
+	indices = list(indices)
+	nodes = [root] if root is not None else []
+	while nodes:
+		node_box, leaves, left, right = nodes.pop()
+		if not _overlap(node_box, box):
+			continue
+		if leaves is None:
+			nodes += [left, right]
+		else:
+			indices += leaves
+	return sorted(indices)
+
+def _query_many(hierarchy, points):
+	"""for each box, ordered indices of points it (may) contain."""
+	root, unbounded = hierarchy
+	selections = {i: list(range(len(points))) for i in unbounded}
+	nodes = [(root, range(len(points)))] if root is not None else []
+	while nodes:
+		(box, leaves, left, right), selection = nodes.pop()
+		selection = [i for i in selection if _contains(box, *points[i])]
+		if not selection:
+			continue
+		if leaves is None:
+			nodes += [(left, selection), (right, selection)]
+		else:
+			for leaf in leaves:
+				selections[leaf] = selection
+	return selections
+
+def _hierarchy_bbox(hierarchy):
+	"""bbox of all boxes in hierarchy (None if unbounded)."""
+	root, unbounded = hierarchy
+	if unbounded:
+		return None
+	if root is None:
+		return (INF, INF), (-INF, -INF)
+	box, _, _, _ = root
+	return box
+
+
+# caching ####################################################################
+
+def _cached(cache, element, du2, compute):
+	"""data cached by scale index (and inherited values) of element."""
+	scale_index, values = _scale_index(du2), element._inherited_values()
+	try:
+		cached_values, data = cache[scale_index]
+	except KeyError:
+		pass
+	else:
+		if cached_values == values:
+			return data
+	data = compute()
+	cache[scale_index] = values, data
+	return data
+
+def _bounds(element, du2):
+	"""conservative bbox of element in parent coordinates (None if unknown).
+
+	du2 is the surface of a pixel in parent coordinates.
+	"""
+	def bounds():
+		matrix = element.matrix()
+		bounds = element._local_bounds(du2*_du2(matrix))
+		return _transformed(matrix, bounds)
+	element._validate()
+	return _cached(element._derived.setdefault("bounds", {}), element, du2, bounds)
+
+def _children_hierarchy(group, du2):
+	"""bvh of group children bounds in group coordinates."""
+	def hierarchy():
+		return _hierarchy([_bounds(child, du2) for child in group.children])
+	group._validate()
+	return _cached(group._derived.setdefault("hierarchy", {}), group, du2, hierarchy)
+
+def _children_at(group, x, y, transform):
+	"""children of group whose bounds contain (x, y) (in world coordinates)."""
+	hierarchy = _children_hierarchy(group, _du2(transform))
+	x, y = transform.inverse().project(x, y)
+	children = group.children
+	return [children[i] for i in _query(hierarchy, x, y)]
+
+def _children_at_many(group, points, transform):
+	"""for each child of group, indices of points its bounds may contain."""
+	hierarchy = _children_hierarchy(group, _du2(transform))
+	points = _projections(transform.inverse().abcdef, points)
+	selections = _query_many(hierarchy, points)
+	return [selections.get(i, []) for i in range(len(group.children))]
+
+def _children_in(group, region, transform):
+	"""children of group whose bounds (may) intersect region."""
+	hierarchy = _children_hierarchy(group, _du2(transform))
+	region = _projections(transform.inverse().abcdef, region)
+	children = group.children
+	return [children[i] for i in _query_box(hierarchy, _bbox([region]))]
+
+
+# convex hulls ###############################################################
+
+def _parent_hull(element, du2, inheriteds):
+	"""convex hull of element in parent coordinates (None if unknown).
+	
+	du2 is the surface of a pixel in parent coordinates.
+	"""
+	inheriteds = element._inherit(inheriteds)
+	def hull():
+		matrix = element.matrix()
+		hull = element._local_hull(du2*_du2(matrix), inheriteds)
+		if hull is None:
+			return None
+		return _projections(matrix.abcdef, hull)
+	element._validate()
+	return _cached(element._derived.setdefault("hull", {}), element, du2, hull)
+
+def _union_hull(hulls):
+	"""convex hull of hulls (None if one is unknown)."""
+	points = []
+	for hull in hulls:
+		if hull is None:
+			return None
+		points += hull
+	return _hull(points)
+
+def _hull_bbox(hull, transform):
+	"""bbox of transformed convex hull."""
+	if not hull:
+		return _bbox([])
+	return _bbox([_projections(transform.abcdef, hull)])
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+"""
+least recently used cache of geometry shared by all elements
+"""
+
+
+# imports ####################################################################
+
+from collections import OrderedDict
+from threading import RLock
+from weakref import ref, finalize, WeakValueDictionary
+
+
+# sizes ######################################################################
+
+_POINT_SIZE = 2*8   # 2 doubles per point in cpu memory
+_VERTEX_SIZE = 2*4  # 2 floats per vertex in vbo
+
+def _points_size(points):
+	"""bytes used by a list (or numpy array) of points."""
+	try:
+		return points.nbytes
+	except AttributeError:
+		return len(points) * _POINT_SIZE
+
+def _vbo_size(vbo):
+	"""bytes used by a (vertex count, vbo id) pair."""
+	n, _ = vbo
+	return n * _VERTEX_SIZE
+
+
+# cache manager ##############################################################
+
+class _Cache(dict):
+	"""per element cache mapping scale index to data."""
+
+
+class CacheManager(object):
+	"""global cache manager evicting least recently used data
+
+	entries of every element cache are accounted (in bytes) against a single
+	budget, evicted entries are dropped from their cache, which in turn
+	releases their vbos.
+	caches created with a content key are shared by all the elements asking
+	for the same key, they are released (with their vbos) as soon as the last
+	element holding them is gone.
+	"""
+
+	def __init__(self, budget=128*1024*1024):
+		self._budget = budget
+		self._entries = OrderedDict() # (cache id, key) -> (cache ref, size)
+		self._keys = {}               # cache id -> keys
+		self._deads = []              # ids of collected caches
+		self._shared = WeakValueDictionary() # content key -> cache
+		self._lock = RLock()
+		self.size = 0
+		self.hits = self.misses = 0
+
+	def __repr__(self):
+		return "<%s %i/%i bytes, %i entries, %i hits, %i misses>" % (
+			type(self).__name__, self.size, self.budget, len(self._entries),
+			self.hits, self.misses,
+		)
+
+	@property
+	def budget(self):
+		return self._budget
+
+	@budget.setter
+	def budget(self, budget):
+		with self._lock:
+			self._budget = budget
+			self._evict()
+
+	def cache(self, key=None):
+		"""a cache managed by self, shared by all callers with the same key."""
+		with self._lock:
+			if key is not None:
+				try:
+					return self._shared[key]
+				except KeyError:
+					pass
+			cache = _Cache()
+			cache_id = id(cache)
+			self._forget() # cache id may have been recycled
+			self._keys[cache_id] = set()
+			finalize(cache, self._deads.append, cache_id)
+			if key is not None:
+				self._shared[key] = cache
+			return cache
+
+	def get(self, cache, key):
+		"""cached data, raises KeyError if missing."""
+		with self._lock:
+			self._forget()
+			try:
+				data = cache[key]
+			except KeyError:
+				self.misses += 1
+				raise
+			self.hits += 1
+			self._entries.move_to_end((id(cache), key))
+			return data
+
+	def keys(self, cache):
+		"""keys of cached data."""
+		with self._lock:
+			return list(cache)
+
+	def set(self, cache, key, data, size):
+		"""store data in cache, evicting older entries if over budget."""
+		with self._lock:
+			self._forget()
+			cache_id = id(cache)
+			entry = cache_id, key
+			if entry in self._entries:
+				_, old_size = self._entries.pop(entry)
+				self.size -= old_size
+			cache[key] = data
+			self._entries[entry] = ref(cache), size
+			self._keys[cache_id].add(key)
+			self.size += size
+			self._evict()
+
+	def clear(self):
+		"""drop every entry and reset statistics."""
+		with self._lock:
+			for (_, key), (cache_ref, _) in self._entries.items():
+				cache = cache_ref()
+				if cache is not None:
+					cache.pop(key, None)
+			self._entries.clear()
+			for keys in self._keys.values():
+				keys.clear()
+			self.size = 0
+			self.hits = self.misses = 0
+
+	def _forget(self):
+		"""drop entries of collected caches."""
+		while self._deads:
+			cache_id = self._deads.pop()
+			for key in self._keys.pop(cache_id, ()):
+				_, size = self._entries.pop((cache_id, key))
+				self.size -= size
+
+	def _evict(self):
+		"""drop least recently used entries until under budget.
+
+		the most recent entry is always kept, as it is about to be used.
+		"""
+		while self.size > self._budget and len(self._entries) > 1:
+			(cache_id, key), (cache_ref, size) = self._entries.popitem(last=False)
+			self._keys[cache_id].discard(key)
+			cache = cache_ref()
+			if cache is not None:
+				cache.pop(key, None)
+			self.size -= size
+
+
+cache_manager = CacheManager()
@@ -9,7 +9,7 @@ Low level path utility functions suitable for optimizations based on typing.
 
 # imports ####################################################################
 
-from math import hypot, sqrt, pi, cos, sin, atan2, radians
+from math import hypot, sqrt, ceil, floor, pi, cos, sin, atan2, radians
 
 
 # constants ##################################################################
@@ -55,30 +55,44 @@ def _lerp(p0, p1, t=.5):
 
 # Bézier splines
 
-_L2_RATIO = 4 # trade-off precision for polygons
+_TOLERANCE = .5 # maximal distance (in pixel) between curves and flattening
 
-def _casteljau(p0, p1, p2, p3, t=.5):
-	"""de Casteljau subdivision of cubic Bézier curve."""
-	p01, p12, p23 = _lerp(p0, p1, t), _lerp(p1, p2, t), _lerp(p2, p3, t)
-	p012, p123 = _lerp(p01, p12, t), _lerp(p12, p23, t)
-	p0123 = _lerp(p012, p123, t)
-	return p01, p12, p23, p012, p123, p0123
+def _cubic_steps(p0, p1, p2, p3, du2):
+	"""number of segments needed to flatten a cubic Bézier spline.
+	
+	Wang's formula bounds the distance between the curve and its uniform
+	subdivision in n segments by 3/4*max(|p0-2p1+p2|, |p1-2p2+p3|)/n².
+	"""
+	(x0, y0), (x1, y1), (x2, y2), (x3, y3) = p0, p1, p2, p3
+	dd = max(hypot(x0-2*x1+x2, y0-2*y1+y2), hypot(x1-2*x2+x3, y1-2*y2+y3))
+	return max(1, int(ceil(sqrt(.75*dd*sqrt(du2)/_TOLERANCE))))
 
 def _cubic(p0, p1, p2, p3, du2):
-	"""cubic Bézier spline flattenization."""
+	"""cubic Bézier spline flattenization by forward differencing."""
 	if (p0, p2) == (p1, p3):
 		return [p3]
 	
+	n = _cubic_steps(p0, p1, p2, p3, du2)
+	path = [p3] * n
+	
 	(x0, y0), (x1, y1), (x2, y2), (x3, y3) = p0, p1, p2, p3
-	d1 = (x3-x0)*(y1-y0) - (y3-y0)*(x1-x0)
-	d2 = (x3-x0)*(y2-y0) - (y3-y0)*(x2-x0)
-	dd03 = (x3-x0)*(x3-x0)+(y3-y0)*(y3-y0)
-	if (d1*d1+d2*d2)*du2 < dd03*_L2_RATIO:
-		return [_lerp(p1, p2), p3]
-	else:
-		p01, p12, p23, p012, p123, p0123 = _casteljau(p0, p1, p2, p3)
-		return _cubic(p0, p01, p012, p0123, du2) + \
-		       _cubic(p0123, p123, p23, p3, du2)
+	h = 1./n
+	h2, h3 = h*h, h*h*h
+	ax, ay = 3*(x1-x2)+x3-x0, 3*(y1-y2)+y3-y0
+	bx, by = 3*(x0-2*x1+x2),  3*(y0-2*y1+y2)
+	cx, cy = 3*(x1-x0),       3*(y1-y0)
+	
+	x, y = x0, y0
+	dx, dy = ax*h3+bx*h2+cx*h, ay*h3+by*h2+cy*h
+	ddx, ddy = 6*ax*h3+2*bx*h2, 6*ay*h3+2*by*h2
+	dddx, dddy = 6*ax*h3, 6*ay*h3
+	for i in range(n-1):
+		x, y = x+dx, y+dy
+		dx, dy = dx+ddx, dy+ddy
+		ddx, ddy = ddx+dddx, ddy+dddy
+		path[i] = (x, y)
+	
+	return path
 
 def _quadric(p0, p1, p2, du2):
 	"""quadric Bézier spline flattenization by transforming it to cubic."""
@@ -87,19 +101,13 @@ def _quadric(p0, p1, p2, du2):
 
 # arc
 
-def _arc(p0, rs, phi, flags, p1, du2):
-	"""arc flatenization.
+def _arc_ellipse(p0, rs, phi, flags, p1):
+	"""center, radii, rotation and angles of a non degenerated arc.
 	
 	implementation derived from
 	<http://www.w3.org/TR/SVG/implnote.html#ArcImplementationNotes>
 	"""
-	if p0 == p1:
-		return []
-	
-	rx, ry = rs
-	if rx == 0 or ry == 0:
-		return [p1]
-	rx, ry = abs(rx), abs(ry)
+	rx, ry = abs(rs[0]), abs(rs[1])
 	
 	phi = radians(phi) % pi
 	c, s = cos(phi), sin(phi)
@@ -131,9 +139,23 @@ def _arc(p0, rs, phi, flags, p1, du2):
 		if da < 0: da += 2*pi
 	else:
 		if da > 0: da -= 2*pi
+	
+	xc, yc = c*Xc-s*Yc + ux+x1, s*Xc+c*Yc + uy+y1
+	return (xc, yc), (rx, ry), (c, s), a0, da
 
+def _arc(p0, rs, phi, flags, p1, du2):
+	"""arc flatenization."""
+	if p0 == p1:
+		return []
+	
+	rx, ry = rs
+	if rx == 0 or ry == 0:
+		return [p1]
+	
+	(xc, yc), (rx, ry), (c, s), a0, da = _arc_ellipse(p0, rs, phi, flags, p1)
+	
 	path = []
-	xc, yc = c*Xc-s*Yc + ux+x1, s*Xc+c*Yc + uy+y1
+	r2x, r2y = rx*rx, ry*ry
 	N = int((((r2x+r2y)*du2)**.25) * abs(da))
 	for i in range(N-1):
 		a = a0 + da*(i+1)/N
@@ -143,6 +165,105 @@ def _arc(p0, rs, phi, flags, p1, du2):
 	
 	return path
 
+def _arc_controls(p0, rs, phi, flags, p1):
+	"""corners of the box of the arc ellipse, containing the arc."""
+	if p0 == p1:
+		return []
+	
+	rx, ry = rs
+	if rx == 0 or ry == 0:
+		return [p1]
+	
+	(xc, yc), (rx, ry), (c, s), _, _ = _arc_ellipse(p0, rs, phi, flags, p1)
+	ux, uy, vx, vy = rx*c, rx*s, -ry*s, ry*c
+	return [(xc-ux-vx, yc-uy-vy), (xc+ux-vx, yc+uy-vy),
+	        (xc+ux+vx, yc+uy+vy), (xc-ux+vx, yc-uy+vy), p1]
+
+
+# quadric approximations
+
+_CURVE_TOLERANCE = 1e-4 # maximal distance between curves and quadrics,
+                        # relative to the size of curves
+
+def _cubic_quadrics(p0, p1, p2, p3):
+	"""cubic Bézier spline approximation by (control, end) quadrics.
+	
+	the quadric of control point (3(p1+p2)-(p0+p3))/4 is at most at
+	sqrt(3)/36*|p3-3p2+3p1-p0| of the cubic, a distance divided by n³ when
+	splitting the cubic in n uniform parts.
+	"""
+	(x0, y0), (x1, y1), (x2, y2), (x3, y3) = p0, p1, p2, p3
+	size = max(hypot(x-x0, y-y0) for x, y in (p1, p2, p3))
+	if size == 0.:
+		return []
+	
+	ax, ay = x3-3*x2+3*x1-x0, y3-3*y2+3*y1-y0
+	bx, by = 3*(x0-2*x1+x2),  3*(y0-2*y1+y2)
+	cx, cy = 3*(x1-x0),       3*(y1-y0)
+	e = sqrt(3.)/36. * hypot(ax, ay) / (_CURVE_TOLERANCE*size)
+	n = max(1, int(ceil(e**(1/3.))))
+	h = 1./n
+	
+	quadrics = []
+	x, y, dx, dy = x0, y0, cx, cy
+	for i in range(1, n+1):
+		t = i*h
+		if i == n:
+			xt, yt = x3, y3
+		else:
+			xt, yt = ((ax*t+bx)*t+cx)*t+x0, ((ay*t+by)*t+cy)*t+y0
+		dxt, dyt = (3*ax*t+2*bx)*t+cx, (3*ay*t+2*by)*t+cy
+		control = (.5*(x+xt) + .25*h*(dx-dxt), .5*(y+yt) + .25*h*(dy-dyt))
+		quadrics.append((control, (xt, yt)))
+		x, y, dx, dy = xt, yt, dxt, dyt
+	return quadrics
+
+def _arc_quadrics(p0, rs, phi, flags, p1):
+	"""arc approximation by (control, end) quadrics.
+	
+	the quadric approximating an arc of angle a of the unit circle is at most
+	at (1-cos(a/2))²/(2cos(a/2)) ~ a⁴/128 of it.
+	"""
+	if p0 == p1:
+		return []
+	
+	rx, ry = rs
+	if rx == 0 or ry == 0:
+		return [(_lerp(p0, p1), p1)]
+	
+	(xc, yc), (rx, ry), (c, s), a0, da = _arc_ellipse(p0, rs, phi, flags, p1)
+	n = max(1, int(ceil(abs(da) / min(pi/2., (128.*_CURVE_TOLERANCE)**.25))))
+	h = da/n
+	k = 1./cos(h/2.)
+	
+	quadrics = []
+	for i in range(n):
+		a = a0 + h*(i+.5)
+		X, Y = k*rx*cos(a), k*ry*sin(a)
+		control = (c*X-s*Y+xc, s*X+c*Y+yc)
+		if i == n-1:
+			end = p1
+		else:
+			a = a0 + h*(i+1)
+			X, Y = rx*cos(a), ry*sin(a)
+			end = (c*X-s*Y+xc, s*X+c*Y+yc)
+		quadrics.append((control, end))
+	return quadrics
+
+def _quadrics_extrema(curves):
+	"""points of (p0, p1, p2) quadrics where x or y is extremal."""
+	points = []
+	for (x0, y0), (x1, y1), (x2, y2) in curves:
+		for u0, u1, u2 in ((x0, x1, x2), (y0, y1, y2)):
+			w = u0-2*u1+u2
+			if w == 0.:
+				continue
+			t = (u0-u1)/w
+			if 0. < t < 1.:
+				v = 1.-t
+				points.append((v*v*x0+2*v*t*x1+t*t*x2, v*v*y0+2*v*t*y1+t*t*y2))
+	return points
+
 
 # stroking ###################################################################
 
@@ -197,6 +318,9 @@ def _caps_round(p0, p1, hw, du=1, start=True):
 
 # join
 
+_MITER_TOLERANCE = 1e-9 # miters this close to the limit are not clipped,
+                        # whatever the rounding of their length
+
 def _join_miter(p0, p1, p2, hw, du, miterlimit):
 	p0a, p0b, p1a, p1b = _join_bevel(p0, p1, p2, hw, du, miterlimit)
 	l0, l1 = _line(p0, p1), _line(p1, p2)
@@ -206,7 +330,7 @@ def _join_miter(p0, p1, p2, hw, du, miterlimit):
 	except ZeroDivisionError:
 		return [p1a, p1b]
 	r = miterlimit*hw/_h(p1a, pa)
-	if r < 1.:
+	if r < 1.-_MITER_TOLERANCE:
 		return [_lerp(p0a, pa, r), _lerp(p0b, pb, r),
 		        _lerp(p1a, pa, r), _lerp(p1b, pb, r)]
 #		return [p0a, p0b, p1a, p1b]
@@ -282,6 +406,14 @@ def _stroke(path, closed, joins, width, du=1.,
 	
 	return b + stroke + e
 
+def _extrusions(strip1, strip2):
+	"""(x, y, dx, dy) vertices from strips of half widths 1 and 2.
+	
+	vertices of the strip of half width hw are at (x+hw*dx, y+hw*dy).
+	"""
+	return [(2.*x1-x2, 2.*y1-y2, x2-x1, y2-y1)
+	        for (x1, y1), (x2, y2) in zip(strip1, strip2)]
+
 
 # filling ####################################################################
 
@@ -327,6 +459,353 @@ def _stroke_hit(x, y, strokes):
 	return False
 
 
+# spatial indexing ###########################################################
+
+def _points(path):
+	"""path as list of 2-tuple (path may be a numpy array)."""
+	try:
+		return [tuple(p) for p in path.tolist()]
+	except AttributeError:
+		return path
+
+def _edges_index(paths):
+	"""non horizontal edges of closed discretized paths in horizontal bands."""
+	edges = []
+	for path, _, _ in paths:
+		path = _points(path)
+		if len(path) < 3:
+			continue
+		x0, y0 = path[-1]
+		for x1, y1 in path:
+			if y0 != y1:
+				edges.append((x0, y0, x1, y1))
+			x0, y0 = x1, y1
+	if not edges:
+		return None
+	
+	y_min = min(min(y0, y1) for _, y0, _, y1 in edges)
+	y_max = max(max(y0, y1) for _, y0, _, y1 in edges)
+	n = int(sqrt(len(edges))) + 1
+	h = (y_max-y_min)/n or 1.
+	bands = [[] for _ in range(n)]
+	for edge in edges:
+		_, y0, _, y1 = edge
+		i0 = int((min(y0, y1)-y_min)/h)
+		i1 = min(int((max(y0, y1)-y_min)/h), n-1)
+		for i in range(i0, i1+1):
+			bands[i].append(edge)
+	return y_min, h, bands
+
+def _winding(x, y, index):
+	"""winding number of paths around (x, y) using edges index."""
+	if index is None:
+		return 0
+	y_min, h, bands = index
+	i = int(floor((y-y_min)/h))
+	if not 0 <= i < len(bands):
+		return 0
+	winding = 0
+	for x0, y0, x1, y1 in bands[i]:
+		if y0 <= y < y1:
+			if (x1-x0)*(y-y0) > (x-x0)*(y1-y0):
+				winding += 1
+		elif y1 <= y < y0:
+			if (x1-x0)*(y-y0) < (x-x0)*(y1-y0):
+				winding -= 1
+	return winding
+
+def _evenodd_index_hit(x, y, index):
+	"""even/odd hit test on interior of a path using edges index."""
+	return (_winding(x, y, index) % 2) == 1
+
+def _nonzero_index_hit(x, y, index):
+	"""non-zero hit test on interior of a path using edges index."""
+	return _winding(x, y, index) != 0
+
+
+def _strip_triangles(strip):
+	"""non degenerated triangles of strip."""
+	strip = _points(strip)
+	triangles = []
+	for i in range(len(strip)-2):
+		p0, p1, p2 = strip[i:i+3]
+		a, b, c = _line(p0, p1)
+		x2, y2 = p2
+		if a*x2+b*y2+c != 0.:
+			triangles.append((p0, p1, p2))
+	return triangles
+
+def _triangles_index(strip):
+	"""non degenerated triangles of strip in a uniform grid."""
+	triangles = _strip_triangles(strip)
+	if not triangles:
+		return None
+	
+	(x_min, y_min), (x_max, y_max) = _bbox(triangles)
+	n = int(sqrt(len(triangles))) + 1
+	w, h = (x_max-x_min)/n or 1., (y_max-y_min)/n or 1.
+	cells = {}
+	for triangle in triangles:
+		(tx_min, ty_min), (tx_max, ty_max) = _bbox([triangle])
+		i0, i1 = int((tx_min-x_min)/w), min(int((tx_max-x_min)/w), n-1)
+		j0, j1 = int((ty_min-y_min)/h), min(int((ty_max-y_min)/h), n-1)
+		for i in range(i0, i1+1):
+			for j in range(j0, j1+1):
+				cells.setdefault((i, j), []).append(triangle)
+	return x_min, y_min, w, h, cells
+
+def _stroke_index_hit(x, y, index):
+	"""hit test on stroke of a path using triangles index."""
+	if index is None:
+		return False
+	x_min, y_min, w, h, cells = index
+	i, j = int(floor((x-x_min)/w)), int(floor((y-y_min)/h))
+	for p0, p1, p2 in cells.get((i, j), []):
+		a0, b0, c0 = _line(p0, p1)
+		a1, b1, c1 = _line(p1, p2)
+		a2, b2, c2 = _line(p2, p0)
+		s0, s1, s2 = a0*x+b0*y+c0, a1*x+b1*y+c1, a2*x+b2*y+c2
+		if (s0*s1 > 0) and (s1*s2 > 0):
+			return True
+	return False
+
+
+def _windings(points, index):
+	"""winding numbers of paths around points using edges index."""
+	return [_winding(x, y, index) for x, y in points]
+
+def _stroke_index_hits(points, index):
+	"""hit tests of points on stroke of a path using triangles index."""
+	return [_stroke_index_hit(x, y, index) for x, y in points]
+
+def _projections(abcdef, points):
+	"""points projected by the matrix of coefficients abcdef."""
+	a, b, c, d, e, f = abcdef
+	return [(a*x+c*y+e, b*x+d*y+f) for x, y in points]
+
+
+# region testing #############################################################
+
+def _orientation(p0, p1, p2):
+	(x0, y0), (x1, y1), (x2, y2) = p0, p1, p2
+	o = (x1-x0)*(y2-y0) - (y1-y0)*(x2-x0)
+	return (o > 0) - (o < 0)
+
+def _segments_cross(p0, p1, q0, q1):
+	"""whether segments [p0, p1] and [q0, q1] properly cross."""
+	return (_orientation(p0, p1, q0) * _orientation(p0, p1, q1) < 0 and
+	        _orientation(q0, q1, p0) * _orientation(q0, q1, p1) < 0)
+
+def _edges(polygon):
+	"""edges of closed polygon."""
+	return zip(polygon, polygon[1:] + polygon[:1])
+
+def _inside(x, y, polygon):
+	"""even/odd inside test of (x, y) in polygon."""
+	inside = False
+	for (x0, y0), (x1, y1) in _edges(polygon):
+		if (y0 <= y < y1) or (y1 <= y < y0):
+			if x < x0 + (y-y0)*(x1-x0)/(y1-y0):
+				inside = not inside
+	return inside
+
+def _crosses(polygon, region):
+	"""whether an edge of polygon crosses an edge of region."""
+	(x_min, y_min), (x_max, y_max) = _bbox([region])
+	region_edges = list(_edges(region))
+	for p0, p1 in _edges(polygon):
+		(x0, y0), (x1, y1) = p0, p1
+		if (max(x0, x1) < x_min or min(x0, x1) > x_max or
+		    max(y0, y1) < y_min or min(y0, y1) > y_max):
+			continue
+		for q0, q1 in region_edges:
+			if _segments_cross(p0, p1, q0, q1):
+				return True
+	return False
+
+def _hull(points):
+	"""convex hull of points (counterclockwise, monotone chain algorithm)."""
+	points = sorted(set(map(tuple, _points(points))))
+	if len(points) <= 2:
+		return points
+	def chain(points):
+		chain = []
+		for p in points:
+			while len(chain) >= 2 and _orientation(chain[-2], chain[-1], p) <= 0:
+				chain.pop()
+			chain.append(p)
+		return chain[:-1]
+	return chain(points) + chain(reversed(points))
+
+def _region_intersects(polygons, region, inside):
+	"""whether geometry (given by its polygons and inside test) meets region."""
+	if any(inside(x, y) for x, y in region):
+		return True
+	for polygon in polygons:
+		polygon = list(polygon)
+		if any(_inside(x, y, region) for x, y in polygon):
+			return True
+		if _crosses(polygon, region):
+			return True
+	return False
+
+def _region_contains(polygons, region):
+	"""whether geometry (given by its polygons) lies inside region."""
+	for polygon in polygons:
+		polygon = list(polygon)
+		if not all(_inside(x, y, region) for x, y in polygon):
+			return False
+		if _crosses(polygon, region):
+			return False
+	return True
+
+
+# triangulation ##############################################################
+
+_EAR_CLIPPING_LIMIT = 256 # maximal size of concave polygons to triangulate
+
+def _polygon(path):
+	"""closed polygon of path, without repeated points."""
+	polygon = []
+	for p in _points(path):
+		if not polygon or p != polygon[-1]:
+			polygon.append(p)
+	if len(polygon) > 1 and polygon[0] == polygon[-1]:
+		polygon.pop()
+	return polygon
+
+def _area2(polygon):
+	"""twice the signed area of polygon."""
+	return sum(x0*y1-x1*y0 for (x0, y0), (x1, y1) in _edges(polygon))
+
+def _convex(polygon):
+	"""whether polygon is convex, turning once around its interior."""
+	sign, turn = 0, 0.
+	for p0, p1, p2 in zip(polygon[-2:] + polygon[:-2],
+	                      polygon[-1:] + polygon[:-1], polygon):
+		o = _orientation(p0, p1, p2)
+		if o:
+			if sign and o != sign:
+				return False
+			sign = o
+		(x0, y0), (x1, y1), (x2, y2) = p0, p1, p2
+		turn += atan2((x1-x0)*(y2-y1)-(y1-y0)*(x2-x1),
+		              (x1-x0)*(x2-x1)+(y1-y0)*(y2-y1))
+	return sign != 0 and abs(abs(turn) - 2*pi) < 1e-6
+
+def _segments_meet(p0, p1, q0, q1):
+	"""whether closed segments [p0, p1] and [q0, q1] have a common point."""
+	o0, o1 = _orientation(p0, p1, q0), _orientation(p0, p1, q1)
+	o2, o3 = _orientation(q0, q1, p0), _orientation(q0, q1, p1)
+	if o0*o1 < 0 and o2*o3 < 0:
+		return True
+	def on(p, q, r): # r on [p, q], knowing they are aligned
+		(x0, y0), (x1, y1), (x, y) = p, q, r
+		return min(x0, x1) <= x <= max(x0, x1) and min(y0, y1) <= y <= max(y0, y1)
+	return ((o0 == 0 and on(p0, p1, q0)) or (o1 == 0 and on(p0, p1, q1)) or
+	        (o2 == 0 and on(q0, q1, p0)) or (o3 == 0 and on(q0, q1, p1)))
+
+def _simple(polygon):
+	"""whether edges of polygon only meet their neighbours at end points.
+	
+	edges are swept by increasing x, only those overlapping in x are tested.
+	"""
+	n = len(polygon)
+	def edge(i):
+		return polygon[i], polygon[(i+1)%n]
+	def x_max(i):
+		(x0, _), (x1, _) = edge(i)
+		return max(x0, x1)
+	
+	actives = []
+	for i in sorted(range(n), key=lambda i: min(edge(i)[0][0], edge(i)[1][0])):
+		p0, p1 = edge(i)
+		x_min = min(p0[0], p1[0])
+		actives = [j for j in actives if x_max(j) >= x_min]
+		for j in actives:
+			q0, q1 = edge(j)
+			if (j+1) % n == i:   # q1 is p0, edges must not fold back
+				meet = _orientation(q0, p0, p1) == 0 and \
+				       _segments_meet(q0, q0, p0, p1)
+			elif (i+1) % n == j: # p1 is q0
+				meet = _orientation(p0, p1, q1) == 0 and \
+				       _segments_meet(p0, p0, q0, q1)
+			else:
+				meet = _segments_meet(p0, p1, q0, q1)
+			if meet:
+				return False
+		actives.append(i)
+	return True
+
+def _in_triangle(p, p0, p1, p2):
+	"""whether p is in (or on) counterclockwise triangle (p0, p1, p2)."""
+	return (_orientation(p0, p1, p) >= 0 and _orientation(p1, p2, p) >= 0 and
+	        _orientation(p2, p0, p) >= 0)
+
+def _ear_clipping(polygon):
+	"""triangles of a simple polygon (None if stuck on degeneracies)."""
+	indices = list(range(len(polygon)))
+	if _area2(polygon) < 0:
+		indices.reverse()
+	triangles = []
+	i, misses = 0, 0
+	while len(indices) > 3:
+		n = len(indices)
+		if misses > n:
+			return None
+		i %= n
+		a, b, c = indices[i-1], indices[i], indices[(i+1)%n]
+		p0, p1, p2 = polygon[a], polygon[b], polygon[c]
+		o = _orientation(p0, p1, p2)
+		if o == 0: # flat vertex
+			del indices[i]
+			misses = 0
+		elif o > 0 and not any(_in_triangle(polygon[j], p0, p1, p2)
+		                       for j in indices if j not in (a, b, c)):
+			triangles += [p0, p1, p2]
+			del indices[i]
+			misses = 0
+		else:
+			i += 1
+			misses += 1
+	if len(indices) == 3:
+		triangles += [polygon[j] for j in indices]
+	return triangles
+
+def _triangulation(paths):
+	"""triangles covering once the interior of paths (None if not possible).
+	
+	only simple polygons with disjoint bboxes are triangulated, so that both
+	fill rules give the same interior.
+	"""
+	polygons = [_polygon(path) for path, _, _ in paths]
+	polygons = [polygon for polygon in polygons if len(polygon) > 2]
+	actives = [] # sweeping bboxes by increasing x
+	for (x_min, y_min), (x_max, y_max) in sorted(_bbox([polygon])
+	                                             for polygon in polygons):
+		actives = [box for box in actives if box[1][0] >= x_min]
+		for (_, y_min0), (_, y_max0) in actives:
+			if y_min <= y_max0 and y_min0 <= y_max:
+				return None
+		actives.append(((x_min, y_min), (x_max, y_max)))
+	
+	triangles = []
+	for polygon in polygons:
+		if _convex(polygon):
+			p0 = polygon[0]
+			for p1, p2 in zip(polygon[1:-1], polygon[2:]):
+				triangles += [p0, p1, p2]
+		elif len(polygon) <= _EAR_CLIPPING_LIMIT and _simple(polygon):
+			ears = _ear_clipping(polygon)
+			if ears is None:
+				return None
+			triangles += ears
+		else:
+			return None
+	return triangles
+
+
+
 def _bbox(paths):
 	"""bounding box of a path."""
 	x_min = y_min = +INF
@@ -336,3 +815,11 @@ def _bbox(paths):
 		x_min, x_max = min(x_min, min(xs)), max(x_max, max(xs))
 		y_min, y_max = min(y_min, min(ys)), max(y_max, max(ys))
 	return (x_min, y_min), (x_max, y_max)
+
+
+# batching ###################################################################
+
+def _colored_projections(abcdef, points, rgba):
+	"""(x, y, r, g, b, a) vertices of points projected by abcdef."""
+	a, b, c, d, e, f = abcdef
+	return [(a*x+c*y+e, b*x+d*y+f, *rgba) for x, y in points]
@@ -0,0 +1,484 @@
+# -*- coding: utf-8 -*-
+
+"""
+scenegraph.element._path_numpy
+
+Vectorized counterparts of the path utility functions, used in place of the
+pure python ones when numpy is available.
+
+Paths are flattened into float arrays of shape (n, 2): all the curved
+segments of a path are first collected, then discretized in batch.
+"""
+
+
+# imports ####################################################################
+
+from math import sqrt, pi
+
+import numpy as np
+
+from ._path import INF, _TOLERANCE, _MITER_TOLERANCE, _caps, _joins, _hull as _python_hull
+
+
+# constants ##################################################################
+
+_LINE, _CUBIC, _ARC = range(3)
+
+
+# flattening #################################################################
+
+def _cubic_counts(cubics, du2):
+	"""number of segments needed to flatten cubics (Wang's formula)."""
+	p0, p1, p2, p3 = cubics[:, 0:2], cubics[:, 2:4], cubics[:, 4:6], cubics[:, 6:8]
+	dd = np.maximum(np.hypot(*(p0-2.*p1+p2).T), np.hypot(*(p1-2.*p2+p3).T))
+	n = np.ceil(np.sqrt(.75*dd*np.sqrt(du2)/_TOLERANCE))
+	n = np.maximum(n, 1).astype(int)
+	degenerate = np.all(p0 == p1, axis=1) & np.all(p2 == p3, axis=1)
+	n[degenerate] = 1
+	return n
+
+def _cubic_points(cubics, n):
+	"""evaluate cubics at t = k/n for k in 1..n."""
+	i = np.repeat(np.arange(len(n)), n)
+	k = np.arange(len(i)) - np.repeat(np.cumsum(n)-n, n) + 1
+	t = (k/n[i])[:, None]
+	s = 1.-t
+	c = cubics[i]
+	return (s*s*s)*c[:, 0:2] + (3.*s*s*t)*c[:, 2:4] + \
+	       (3.*s*t*t)*c[:, 4:6] + (t*t*t)*c[:, 6:8]
+
+
+def _arc_counts_and_points(arcs, du2):
+	"""arc flatenization (see _path._arc)."""
+	x0, y0, rx, ry, phi, large_arc, sweep, x1, y1 = arcs.T
+	rx, ry = np.abs(rx), np.abs(ry)
+
+	phi = np.radians(phi) % np.pi
+	c, s = np.cos(phi), np.sin(phi)
+
+	ux, uy = .5*(x0-x1), .5*(y0-y1)
+	X, Y = c*ux+s*uy, -s*ux+c*uy
+
+	X2, Y2, r2x, r2y = X*X, Y*Y, rx*rx, ry*ry
+	L2 = X2/r2x + Y2/r2y
+	L2 = np.where(L2 > 1., L2, 1.)
+	L = np.sqrt(L2)
+	rx, ry = L*rx, L*ry
+	r2x, r2y = L2*r2x, L2*r2y
+
+	with np.errstate(divide="ignore", invalid="ignore"):
+		K = np.sqrt(np.maximum(0., (r2x*r2y - r2x*Y2 - r2y*X2)/(r2x*Y2+r2y*X2)))
+	K = np.where((large_arc != 0) == (sweep != 0), -K, K)
+	Xc, Yc = K*Y*rx/ry, -K*X*ry/rx
+
+	a0 = np.arctan2(-(Yc-Y)/ry, -(Xc-X)/rx)
+	da = np.arctan2(-(Yc+Y)/ry, -(Xc+X)/rx) - a0
+	da = np.where((sweep != 0) & (da < 0), da + 2*np.pi, da)
+	da = np.where((sweep == 0) & (da > 0), da - 2*np.pi, da)
+
+	xc, yc = c*Xc-s*Yc + ux+x1, s*Xc+c*Yc + uy+y1
+	N = (((r2x+r2y)*du2)**.25 * np.abs(da)).astype(int)
+	n = np.maximum(N, 1)
+
+	i = np.repeat(np.arange(len(n)), n)
+	k = np.arange(len(i)) - np.repeat(np.cumsum(n)-n, n) + 1
+	a = a0[i] + da[i]*k/n[i]
+	X, Y = rx[i]*np.cos(a), ry[i]*np.sin(a)
+	points = np.column_stack((c[i]*X-s[i]*Y+xc[i], s[i]*X+c[i]*Y+yc[i]))
+	last = np.cumsum(n)-1
+	points[last] = arcs[:, 7:9] # avoid numerical errors on end points
+	return n, points
+
+
+def _flatten(path_data, du2=1.):
+	"""discretize path into straight segments."""
+	kinds, indices = [], []      # pieces of the flattened path
+	lines, cubics, arcs = [], [], []
+	subpaths = []                # (first piece, last piece, closed, marks)
+	marks = []                   # piece counts at the end of each command
+	first, start = 0, None
+
+	def piece(kind, items, item):
+		indices.append(len(items))
+		items.append(item)
+		kinds.append(kind)
+
+	path_data_iter = iter(path_data)
+	def next_d():
+		return next(path_data_iter)
+
+	pn = p0 = (0., 0.)
+	cn = None
+	for c in path_data_iter:
+		x0, y0 = p0
+		xn, yn = pn
+
+		if c.islower():
+			def next_p():
+				dx, dy = next_d()
+				return (x0+dx, y0+dy)
+			def next_x():
+				dx = next_d()
+				return x0+dx
+			def next_y():
+				dy = next_d()
+				return y0+dy
+			c = c.upper()
+		else:
+			next_x = next_y = next_p = next_d
+
+		if start is None and c not in "MZ":
+			# the current point starts the subpath (after a 'Z')
+			start = p0
+			piece(_LINE, lines, p0)
+			marks = [len(kinds)]
+
+		if c == 'M':
+			p1 = next_p()
+			if len(kinds) > first:
+				subpaths.append((first, len(kinds), False, marks))
+			first, start = len(kinds), p1
+			marks = []
+			piece(_LINE, lines, p1)
+			pn, p0 = p0, p1
+
+		elif c in "LHV":
+			if c == 'L':
+				p1 = next_p()
+			elif c == 'H':
+				p1 = (next_x(), y0)
+			elif c == 'V':
+				p1 = (x0, next_y())
+			piece(_LINE, lines, p1)
+			pn, p0 = p0, p1
+
+		elif c in "CS":
+			if c == 'C':
+				p1 = next_p()
+			else: # 'S'
+				p1 = (2.*x0-xn, 2*y0-yn) if cn in "CS" else p0
+			p2, p3 = next_p(), next_p()
+			piece(_CUBIC, cubics, (*p0, *p1, *p2, *p3))
+			pn, p0 = p2, p3
+
+		elif c in 'QT':
+			if c == 'Q':
+				p1 = next_p()
+			else: # 'T'
+				p1 = (2.*x0-xn, 2*y0-yn) if cn in "QT" else p0
+			p2 = next_p()
+			(x1, y1), (x2, y2) = p1, p2
+			cp1 = (x0+2./3.*(x1-x0), y0+2./3.*(y1-y0))
+			cp2 = (x1+1./3.*(x2-x1), y1+1./3.*(y2-y1))
+			piece(_CUBIC, cubics, (*p0, *cp1, *cp2, *p2))
+			pn, p0 = p1, p2
+
+		elif c == 'A':
+			rs, phi, flags = next_d(), next_d(), next_d()
+			p1 = next_p()
+			if p0 != p1:
+				(rx, ry), (large_arc, sweep) = rs, flags
+				if rx == 0 or ry == 0:
+					piece(_LINE, lines, p1)
+				else:
+					piece(_ARC, arcs, (*p0, rx, ry, phi, large_arc, sweep, *p1))
+			pn, p0 = p0, p1
+
+		elif c == 'Z':
+			x1, y1 = p1 = start if start is not None else p0
+			dx, dy = x1-x0, y1-y0
+			if (dx*dx+dy*dy)*du2 > 1.:
+				piece(_LINE, lines, p1)
+			if len(kinds) > first:
+				subpaths.append((first, len(kinds), True, marks))
+			first, start = len(kinds), None
+			marks = []
+			pn, p0 = p0, p1
+
+		cn = c
+		marks.append(len(kinds))
+
+	if len(kinds) > first:
+		subpaths.append((first, len(kinds), False, marks))
+
+	if not subpaths:
+		return []
+
+	# batched discretization of pieces
+	kinds, indices = np.array(kinds), np.array(indices)
+	counts = np.ones(len(kinds), dtype=int)
+	pieces = [(_LINE, np.array(lines, dtype=float).reshape(-1, 2))]
+	if cubics:
+		cubics = np.array(cubics, dtype=float)
+		n = _cubic_counts(cubics, du2)
+		pieces.append((_CUBIC, _cubic_points(cubics, n)))
+		counts[kinds == _CUBIC] = n[indices[kinds == _CUBIC]]
+	if arcs:
+		n, points = _arc_counts_and_points(np.array(arcs, dtype=float), du2)
+		pieces.append((_ARC, points))
+		counts[kinds == _ARC] = n[indices[kinds == _ARC]]
+
+	offsets = np.concatenate(([0], np.cumsum(counts)))
+	points = np.empty((offsets[-1], 2))
+	for kind, kind_points in pieces:
+		selected = kinds == kind
+		kind_counts = counts[selected]
+		kind_offsets = np.repeat(offsets[:-1][selected], kind_counts)
+		kind_offsets += np.arange(len(kind_offsets)) - \
+		                np.repeat(np.cumsum(kind_counts)-kind_counts, kind_counts)
+		points[kind_offsets] = kind_points
+
+	paths = []
+	for first, last, closed, marks in subpaths:
+		b, e = offsets[first], offsets[last]
+		joins = (offsets[marks] - (b+1)).tolist()
+		paths.append((points[b:e], closed, joins))
+	return paths
+
+
+# filling ####################################################################
+
+def _strip_indices(n):
+	"""verticies indices in triangle strip order, i.e. 0 -1 1 -2 2 ..."""
+	i = np.arange(1, n+1)
+	v, s = np.divmod(i, 2)
+	return v*(s*2-1)
+
+def _join_strips(strips):
+	"""concatenate strips"""
+	joined, size = [], 0
+	for strip in strips:
+		if size:
+			joined.append(np.concatenate((joined[-1][-1:], strip[:1],
+			                              strip[:size % 2])))
+			size += len(joined[-1])
+		joined.append(strip)
+		size += len(strip)
+	if not joined:
+		return np.empty((0, 2))
+	return np.concatenate(joined)
+
+def _fill_strip(paths):
+	"""triangle strip covering the interior of discretized paths."""
+	return _join_strips(_points_array(path)[_strip_indices(len(path))]
+	                    for path, _, _ in paths)
+
+
+# stroking ###################################################################
+
+def _stroke(path, closed, joins, width, du=1.,
+            cap='butt', join='miter', miterlimit=4.):
+	"""compute a stroke from discretized path (see _path._stroke).
+	
+	joins between consecutive segments are computed in batch, caps and
+	closing join are left to the pure python functions.
+	"""
+	hw = width / 2.
+	_cap = _caps[cap]
+	_join = _joins[join]
+	
+	unique = np.ones(len(path), dtype=bool)
+	unique[1:] = np.any(path[1:] != path[:-1], axis=1)
+	indices = np.flatnonzero(unique)
+	points = path[unique]
+	
+	ends = points[[0, 1, -2, -1]] if len(points) > 1 else points[[0]*4]
+	p0i, p1i, p0, p1 = (tuple(p) for p in ends.tolist())
+	if closed:
+		b = e = _join(p0, p1, p1i, hw, du, miterlimit)
+	else:
+		b = _cap(p0i, p1i, hw, du)
+		e = _cap(p0,  p1,  hw, du, start=False)
+	b, e = np.array(b, dtype=float), np.array(e, dtype=float)
+	
+	if len(points) < 3:
+		return np.concatenate((b, e))
+	
+	# vertices of the path with a join, others being smoothed
+	joins = np.asarray(joins, dtype=int)
+	joins = joins[np.argmax(joins >= indices[1]):] if np.any(joins >= indices[1]) else joins[:0]
+	inners = indices[1:-1]
+	matched = np.isin(joins, inners)
+	matched[1:] &= joins[1:] > joins[:-1]
+	n_matched = len(matched) if np.all(matched) else np.argmin(matched)
+	joined = np.isin(inners, joins[:n_matched])
+	
+	(x0, y0), (x1, y1), (x2, y2) = points[:-2].T, points[1:-1].T, points[2:].T
+	
+	# butt ends of segments around each vertex
+	dx0, dy0 = x1-x0, y1-y0
+	dx1, dy1 = x2-x1, y2-y1
+	w0, w1 = hw/np.hypot(dx0, dy0), hw/np.hypot(dx1, dy1)
+	ax0, ay0 = dy0*w0, -dx0*w0
+	ax1, ay1 = dy1*w1, -dx1*w1
+	p0a = np.column_stack((x1+ax0, y1+ay0))
+	p0b = np.column_stack((x1-ax0, y1-ay0))
+	p1a = np.column_stack((x1+ax1, y1+ay1))
+	p1b = np.column_stack((x1-ax1, y1-ay1))
+	
+	# miter
+	a0, b0 = dy0, -dx0
+	a1, b1 = dy1, -dx1
+	w = a0*b1 - a1*b0
+	parallel = np.abs(w) < 1e-6
+	def intersection(q0, q1):
+		c0 = -(a0*q0[:, 0]+b0*q0[:, 1])
+		c1 = -(a1*q1[:, 0]+b1*q1[:, 1])
+		return np.column_stack(((b0*c1 - b1*c0)/w, (c0*a1 - c1*a0)/w))
+	with np.errstate(divide="ignore", invalid="ignore"):
+		pa, pb = intersection(p0a, p1a), intersection(p0b, p1b)
+		limits = np.where(joined & (join == 'miter'), miterlimit, 1.)
+		r = (limits*hw/np.hypot(*(p1a-pa).T))[:, None]
+	clamped = (r[:, 0] < 1.-_MITER_TOLERANCE) & ~parallel
+	
+	n = int(sqrt(hw*du)) + 1
+	k = 2+2*(n+1) if join == 'round' else 4
+	blocks = np.empty((len(x1), k, 2))
+	sizes = np.full(len(x1), 2)
+	blocks[:, 0], blocks[:, 1] = pa, pb
+	r, qa, qb = r[clamped], pa[clamped], pb[clamped]
+	for i, q0, q1 in [(0, p0a, qa), (1, p0b, qb), (2, p1a, qa), (3, p1b, qb)]:
+		q0 = q0[clamped]
+		blocks[clamped, i] = q0 + r*(q1-q0)
+	sizes[clamped] = 4
+	blocks[parallel, 0], blocks[parallel, 1] = p1a[parallel], p1b[parallel]
+	
+	if join == 'bevel':
+		blocks[joined, 0], blocks[joined, 1] = p0a[joined], p0b[joined]
+		blocks[joined, 2], blocks[joined, 3] = p1a[joined], p1b[joined]
+		sizes[joined] = 4
+	elif join == 'round':
+		da = pi/(2*n+1)
+		a = (n-np.arange(n+1))*da
+		c, s = np.cos(a), np.sin(a)
+		x, y = x1[joined, None], y1[joined, None]
+		ax, ay = ax1[joined, None], ay1[joined, None]
+		rounds = np.empty((np.count_nonzero(joined), n+1, 2, 2))
+		rounds[:, :, 0, 0], rounds[:, :, 0, 1] = x+c*ax+s*ay, y+c*ay-s*ax
+		rounds[:, :, 1, 0], rounds[:, :, 1, 1] = x-c*ax+s*ay, y-c*ay-s*ax
+		blocks[joined, 0], blocks[joined, 1] = p0a[joined], p0b[joined]
+		blocks[joined, 2:] = rounds.reshape(-1, 2*(n+1), 2)
+		sizes[joined] = k
+	
+	inner = blocks[np.arange(k) < sizes[:, None]]
+	return np.concatenate((b, inner, e))
+
+
+def _stroke_strip(paths, width, du=1., cap='butt', join='miter', miterlimit=4.):
+	"""triangle strip covering the strokes of discretized paths."""
+	return _join_strips(_stroke(path, closed, joins, width, du,
+	                            cap, join, miterlimit)
+	                    for path, closed, joins in paths)
+
+def _extrusions(strip1, strip2):
+	"""(x, y, dx, dy) vertices from strips of half widths 1 and 2."""
+	strip1, strip2 = _points_array(strip1), _points_array(strip2)
+	return np.column_stack((2.*strip1-strip2, strip2-strip1))
+
+
+# hit testing ################################################################
+
+def _points_array(points):
+	return np.asarray(points, dtype=float).reshape(-1, 2)
+
+def _windings(points, index):
+	"""winding numbers of paths around points using edges index."""
+	x, y = _points_array(points).T
+	windings = np.zeros(len(x), dtype=int)
+	if index is None:
+		return windings.tolist()
+	y_min, h, bands = index
+	i = np.floor((y-y_min)/h)
+	i[(i < 0) | (i >= len(bands))] = -1
+	for band in np.unique(i[i >= 0]).astype(int):
+		selected = np.flatnonzero(i == band)
+		x0, y0, x1, y1 = np.asarray(bands[band], dtype=float).T
+		px, py = x[selected, None], y[selected, None]
+		lhs, rhs = (x1-x0)*(py-y0), (px-x0)*(y1-y0)
+		ups = (y0 <= py) & (py < y1) & (lhs > rhs)
+		downs = (y1 <= py) & (py < y0) & (lhs < rhs)
+		windings[selected] = ups.sum(1) - downs.sum(1)
+	return windings.tolist()
+
+def _stroke_index_hits(points, index):
+	"""hit tests of points on stroke of a path using triangles index."""
+	x, y = _points_array(points).T
+	hits = np.zeros(len(x), dtype=bool)
+	if index is None:
+		return hits.tolist()
+	x_min, y_min, w, h, cells = index
+	ij = np.stack([np.floor((x-x_min)/w), np.floor((y-y_min)/h)], 1)
+	if len(ij) == 0:
+		return hits.tolist()
+	keys, inverse = np.unique(ij, axis=0, return_inverse=True)
+	inverse = inverse.reshape(-1)
+	for k, (i, j) in enumerate(keys.tolist()):
+		try:
+			triangles = cells[int(i), int(j)]
+		except KeyError:
+			continue
+		selected = np.flatnonzero(inverse == k)
+		px, py = x[selected, None], y[selected, None]
+		p0, p1, p2 = np.asarray(triangles, dtype=float).transpose(1, 2, 0)
+		s = []
+		for (x0, y0), (x1, y1) in [(p0, p1), (p1, p2), (p2, p0)]:
+			dx, dy = x1-x0, y1-y0
+			s.append(dy*px + -dx*py + (y0*dx-x0*dy))
+		s0, s1, s2 = s
+		hits[selected] = ((s0*s1 > 0) & (s1*s2 > 0)).any(1)
+	return hits.tolist()
+
+def _hull(points):
+	"""convex hull of points (counterclockwise, monotone chain algorithm).
+	
+	points inside the quadrilateral of extreme points are discarded first.
+	"""
+	points = _points_array(points)
+	if len(points) > 8:
+		x, y = points.T
+		s, d = x+y, x-y
+		quad = points[[x.argmin(), d.argmax(), x.argmax(), d.argmin(),
+		               y.argmin(), s.argmax(), y.argmax(), s.argmin()]]
+		quad = _python_hull(quad.tolist())
+		if len(quad) >= 3:
+			outside = np.zeros(len(points), dtype=bool)
+			for (x0, y0), (x1, y1) in zip(quad, quad[1:] + quad[:1]):
+				outside |= (x1-x0)*(y-y0) - (y1-y0)*(x-x0) <= 0
+			points = np.concatenate([points[outside], np.asarray(quad)])
+	return _python_hull([tuple(p) for p in points.tolist()])
+
+def _projections(abcdef, points):
+	"""points projected by the matrix of coefficients abcdef."""
+	a, b, c, d, e, f = abcdef
+	x, y = _points_array(points).T
+	return list(zip((a*x+c*y+e).tolist(), (b*x+d*y+f).tolist()))
+
+
+# bounding box ###############################################################
+
+def _bbox(paths):
+	"""bounding box of a path."""
+	x_min = y_min = +INF
+	x_max = y_max = -INF
+	for path in paths:
+		if not hasattr(path, "__len__"):
+			path = list(path)
+		path = np.asarray(path, dtype=float).reshape(-1, 2)
+		if len(path):
+			(px_min, py_min), (px_max, py_max) = path.min(0), path.max(0)
+			x_min, x_max = min(x_min, px_min), max(x_max, px_max)
+			y_min, y_max = min(y_min, py_min), max(y_max, py_max)
+	return (float(x_min), float(y_min)), (float(x_max), float(y_max))
+
+
+# batching ###################################################################
+
+def _colored_projections(abcdef, points, rgba):
+	"""(x, y, r, g, b, a) vertices of points projected by abcdef."""
+	a, b, c, d, e, f = abcdef
+	x, y = _points_array(points).T
+	vertices = np.empty((len(x), 6))
+	vertices[:, 0] = a*x+c*y+e
+	vertices[:, 1] = b*x+d*y+f
+	vertices[:, 2:] = rgba
+	return vertices
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""
+background tessellation of paths on a pool of worker threads
+"""
+
+
+# imports ####################################################################
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+
+# tessellator ################################################################
+
+class Tessellator(object):
+	"""schedules cpu side tessellation of paths on worker threads
+
+	when started, paths missing the geometry of the current scale level draw
+	the nearest cached level instead, while the missing level (and the ones
+	just above and below) are computed in background. vbos are still
+	uploaded by the rendering thread.
+	on_ready (if not None) is called from the worker thread each time a
+	level is ready.
+	"""
+
+	def __init__(self):
+		self.on_ready = None
+		self._executor = None
+		self._pending = set()
+		self._lock = Lock()
+
+	@property
+	def enabled(self):
+		return self._executor is not None
+
+	@property
+	def pending(self):
+		"""number of scheduled tessellations not done yet."""
+		return len(self._pending)
+
+	def start(self, workers=None):
+		"""start background tessellation with a pool of workers."""
+		if self._executor is None:
+			self._executor = ThreadPoolExecutor(workers)
+
+	def stop(self, wait=True):
+		"""stop background tessellation, paths tessellate synchronously."""
+		executor, self._executor = self._executor, None
+		if executor is not None:
+			executor.shutdown(wait)
+
+	def schedule(self, key, job):
+		"""run job in background unless a job with same key is pending."""
+		executor = self._executor
+		if executor is None:
+			return
+		with self._lock:
+			if key in self._pending:
+				return
+			self._pending.add(key)
+		executor.submit(self._run, key, job)
+
+	def _run(self, key, job):
+		try:
+			job()
+		finally:
+			with self._lock:
+				self._pending.discard(key)
+			on_ready = self.on_ready
+			if on_ready is not None:
+				on_ready()
+
+
+tessellator = Tessellator()
@@ -15,6 +15,8 @@ from .path import Path
 class Circle(Path):
 	tag = "circle"
 	
+	_geometry_attributes = ["cx", "cy", "r"]
+	
 	cx, cy = 0, 0
 	r = 0
 	
@@ -15,6 +15,8 @@ from .path import Path
 class Ellipse(Path):
 	tag = "ellipse"
 	
+	_geometry_attributes = ["cx", "cy", "rx", "ry"]
+	
 	cx, cy = 0, 0
 	rx, ry = 0, 0
 	
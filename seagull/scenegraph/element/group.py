@@ -7,14 +7,42 @@ scenegraph.element.group
 
 # imports ####################################################################
 
-from . import Element
+from weakref import ref
+
+from . import Element, _NotifyingList
 from ._path import _bbox
+from .path import _du2
+from ._bvh import (_children_at, _children_at_many, _children_in,
+                   _children_hierarchy, _hierarchy_bbox,
+                   _parent_hull, _union_hull, _hull_bbox)
+from ._batch import _draws, _render_batches
 
 
 # group ######################################################################
 
 _empty_bbox = _bbox([])
 
+class _Children(_NotifyingList):
+	"""children list linking its items to the group, invalidated on changes."""
+	
+	def __init__(self, group, children=()):
+		super(_Children, self).__init__(children)
+		self._group = ref(group)
+		self._modified(self)
+	
+	def _modified(self, added=(), removed=()):
+		group = self._group()
+		if group is not None:
+			for child in added:
+				child._link(group)
+			if removed:
+				children = {id(child) for child in group.children}
+				for child in removed:
+					if id(child) not in children:
+						child._unlink(group)
+			group._invalidate()
+
+
 class Group(Element):
 	tag = "g"
 
@@ -22,26 +50,93 @@ class Group(Element):
 		"children",
 	]
 
+	indexed_picking = True
+	batched = False # renders children through retained batches of draws
+	_packed = {}    # chunks of the last compilation, by spans keys
+	
 	def __init__(self, children=None, **attributes):
 		super(Group, self).__init__(**attributes)
 		self.children = children if children != None else []
 		self.active = True
+	
+	def __setattr__(self, attribute, value):
+		replaced = None
+		if attribute == "children":
+			replaced = self.__dict__.get("children")
+			value = _Children(self, value)
+		super(Group, self).__setattr__(attribute, value)
+		if replaced:
+			replaced._modified((), list(replaced)) # unlinks replaced children
 
-	def _aabbox(self, transform, inheriteds):
-		bboxes = (child.aabbox(transform, inheriteds) for child in self.children)
+	def _aabbox(self, transform, inheriteds, exact=True):
+		if exact:
+			hull = self._local_hull(_du2(transform), inheriteds)
+			if hull is not None:
+				return _hull_bbox(hull, transform)
+		bboxes = (child.aabbox(transform, inheriteds, exact)
+		          for child in self.children)
 		return _bbox(bbox for bbox in bboxes if bbox != _empty_bbox)
+	
+	def _local_hull(self, du2, inheriteds):
+		return _union_hull(_parent_hull(child, du2, inheriteds)
+		                   for child in self.children)
 
 	def _render(self, transform, inheriteds, context):
 		if not self.active:
 			return
+		if self.batched:
+			_render_batches(self, transform, inheriteds, context)
+			return
 		for child in self.children:
 			child.render(transform, inheriteds, context)
+	
+	def _draws_content(self, inheriteds, du2):
+		if not self.active:
+			return []
+		draws = []
+		for child in self.children:
+			draws += _draws(child, inheriteds, du2)
+		return draws
 
 	def _pick_content(self, x, y, transform):
+		children = self.children
+		if self.indexed_picking:
+			children = _children_at(self, x, y, transform)
 		hits = []
-		for child in self.children:
+		for child in children:
 			hits += child.pick(x, y, transform)
 		return hits
+	
+	def _pick_content_many(self, points, transform):
+		children = self.children
+		if self.indexed_picking:
+			selections = _children_at_many(self, points, transform)
+		else:
+			selections = [range(len(points))] * len(children)
+		hits = [[] for _ in points]
+		for child, selection in zip(children, selections):
+			if not selection:
+				continue
+			child_hits = child.pick_many([points[i] for i in selection], transform)
+			for i, point_hits in zip(selection, child_hits):
+				hits[i] += point_hits
+		return hits
+	
+	def _pick_region_content(self, region, transform, contained):
+		children = self.children
+		if self.indexed_picking:
+			children = _children_in(self, region, transform)
+		hits = []
+		for child in children:
+			hits += child.pick_region(region, transform, contained)
+		return hits
+	
+	def _local_bounds(self, du2):
+		return _hierarchy_bbox(_children_hierarchy(self, du2))
+
+	def _tessellables_content(self, transform, inheriteds):
+		for child in self.children:
+			yield from child._tessellables(transform, inheriteds)
 
 	def _xml_content(self, defs):
 		return "\n".join(child._xml(defs) for child in self.children)
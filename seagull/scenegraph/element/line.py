@@ -15,6 +15,8 @@ from .path import Path
 class Line(Path):
 	tag = "line"
 	
+	_geometry_attributes = ["x1", "y1", "x2", "y2"]
+	
 	fill = None
 	
 	x1, y1 = 0, 0
@@ -0,0 +1,582 @@
+# -*- coding: utf-8 -*-
+
+"""
+scenegraph.element.markers
+"""
+
+
+# imports ####################################################################
+
+from math import floor, sqrt
+
+try:
+	import numpy as _np
+except ImportError:
+	_np = None
+
+from ...opengl.utils import create_vbo, update_vbo
+from ..paint import Color
+from ..transform import Matrix, Translate, Scale
+from . import Element
+from ._path import _bbox
+from .path import Path, _SCALE_STEP, _du2, _scale_du2, _projections
+from ._bvh import _empty, _bounds, _cached, _parent_hull
+from ._batch import _instancing
+from .use import Use
+
+
+# index ######################################################################
+
+_KEY = 2**32        # keys of cell (i, j) are i*_KEY+j
+_INDEX_SPAN = 64    # columns of cells beyond which all instances are tested
+
+def _keys(cell, centers):
+	ij = _np.floor(centers/cell).astype("i8")
+	return ij[:, 0]*_KEY + ij[:, 1]
+
+
+# instances ##################################################################
+
+_INSTANCE = [
+	("position", "f8", (2,)),
+	("size",     "f8"),
+	("color",    "f4", (4,)),
+]
+
+_HIDDEN = -2**62 # level of null sizes
+
+def _rgba(colors):
+	"""rgba colors from rgb(a) ones."""
+	colors = _np.asarray(colors, dtype="f4")
+	if colors.shape[-1] == 3:
+		alphas = _np.ones(colors.shape[:-1] + (1,), dtype="f4")
+		colors = _np.concatenate([colors, alphas], axis=-1)
+	return colors
+
+def _instances(positions, sizes, colors):
+	"""structured array of instances."""
+	positions = _np.asarray(positions, dtype="f8").reshape(-1, 2)
+	instances = _np.zeros(len(positions), dtype=_INSTANCE)
+	instances["position"] = positions
+	instances["size"] = sizes
+	instances["color"] = 1. if colors is None else _rgba(colors)
+	return instances
+
+def _tolist(instances):
+	"""((x, y), size, (r, g, b, a)) of instances, as python floats."""
+	return zip(instances["position"].tolist(), instances["size"].tolist(),
+	           instances["color"].tolist())
+
+def _levels(sizes):
+	"""scale levels of sizes (see _scale_index), _HIDDEN for null sizes."""
+	sizes = _np.asarray(sizes, dtype="f8")
+	with _np.errstate(divide="ignore", invalid="ignore"):
+		levels = _np.floor(_np.log(sizes)/_np.log(_SCALE_STEP))
+	levels[~(sizes > 0.) | ~_np.isfinite(levels)] = _HIDDEN
+	return levels.astype("i8")
+
+def _rows(instances, abcdef):
+	"""instances rows: transform (with template one) rows, then rgba."""
+	a, b, c, d, e, f = abcdef
+	s = instances["size"]
+	x, y = instances["position"].T
+	r, g, b_, alpha = instances["color"].T
+	return _np.stack([s*a, s*c, s*e+x, s*b, s*d, s*f+y, r, g, b_, alpha],
+	                 axis=1).astype("f4")
+
+
+_ARRANGE_ZOOM = 4. # du2 ratio runs stay arranged for, either way
+
+def _layers(levels, boxes, overlapping):
+	"""painter's layers of instances, from their levels and bboxes.
+	
+	boxes are (x_min, y_min, x_max, y_max) rows, binned in a grid of cells
+	the size of the largest one. an instance is in a layer above the ones of
+	the previous instances it shares a cell with, or in the same one for
+	instances of its level when they may overlap (i.e. drawn as triangles,
+	which keep their order within a draw). the instances of a layer and
+	level can thus be painted at once, fills then strokes.
+	"""
+	n = len(levels)
+	if not n or (len(_np.unique(levels)) == 1 and int(levels[0]) in overlapping):
+		return _np.zeros(n, dtype="i8")
+	cell = float((boxes[:, 2:] - boxes[:, :2]).max()) or 1.
+	ij_min = _np.floor(boxes[:, :2]/cell).astype("i8")
+	ij_max = _np.floor(boxes[:, 2:]/cell).astype("i8")
+	
+	# boxes span up to 2x2 cells
+	corners = [ij_min[:, 0]*_KEY + ij_min[:, 1], ij_min[:, 0]*_KEY + ij_max[:, 1],
+	           ij_max[:, 0]*_KEY + ij_min[:, 1], ij_max[:, 0]*_KEY + ij_max[:, 1]]
+	keys = _np.concatenate(corners)
+	owners = _np.tile(_np.arange(n), 4)
+	order = _np.lexsort((owners, keys))
+	keys, owners = keys[order], owners[order]
+	shared = (keys[1:] == keys[:-1]) & (owners[1:] != owners[:-1])
+	if not _np.any(shared):
+		return _np.zeros(n, dtype="i8") # no instances share a cell
+	
+	# others stay in the first layer
+	sharing = _np.zeros(n, dtype=bool)
+	sharing[owners[1:][shared]] = sharing[owners[:-1][shared]] = True
+	sharing = _np.flatnonzero(sharing)
+	
+	tops = {} # (layer, level or None if several) of the top of cells
+	layers = []
+	for key, level in zip(zip(*(k[sharing].tolist() for k in corners)),
+	                      levels[sharing].tolist()):
+		layer = 0
+		for k in key:
+			try:
+				top, top_level = tops[k]
+			except KeyError:
+				continue
+			if top_level != level or level not in overlapping:
+				top += 1
+			if top > layer:
+				layer = top
+		for k in key:
+			try:
+				top, top_level = tops[k]
+			except KeyError:
+				tops[k] = layer, level
+				continue
+			if layer > top:
+				tops[k] = layer, level
+			elif layer == top and top_level != level:
+				tops[k] = layer, None
+		layers.append(layer)
+	all_layers = _np.zeros(n, dtype="i8")
+	all_layers[sharing] = layers
+	return all_layers
+
+
+class _InstancesBuffer(object):
+	"""rows of visible instances by runs, uploaded to a vbo on demand.
+	
+	runs are (level, first, count) rows painted at once, in painter's order
+	(see _layers). they are arranged again, with the rows, when instances
+	move or when the zoom changes too much for the pixel margins of their
+	bboxes.
+	"""
+	
+	def __init__(self, instances, abcdef):
+		self.abcdef = abcdef
+		self.levels = _levels(instances["size"])
+		self.visible = _np.flatnonzero(self.levels != _HIDDEN)
+		self.visible_levels = _np.unique(self.levels[self.visible]).tolist()
+		self.slots = self.rows = self.runs = None
+		self.du2, self.overlapping = None, None
+		self.vbo_id, self.dirty = None, None
+	
+	def arranged(self, du2, overlapping):
+		"""whether runs are arranged for du2 and levels that may overlap."""
+		return self.runs is not None and overlapping == self.overlapping and \
+		       self.du2 <= du2 < self.du2*_ARRANGE_ZOOM*_ARRANGE_ZOOM
+	
+	def arrange(self, instances, boxes, du2, overlapping):
+		"""arrange rows in runs, boxes being computed for du2."""
+		visible, levels = self.visible, self.levels[self.visible]
+		layers = _layers(levels, boxes[visible], overlapping)
+		order = _np.lexsort((visible, levels, layers))
+		layers, levels, order = layers[order], levels[order], visible[order]
+		
+		self.slots = _np.full(len(instances), -1)
+		self.slots[order] = _np.arange(len(order))
+		self.rows = _rows(instances[order], self.abcdef)
+		firsts = [0] + (_np.flatnonzero((_np.diff(layers) != 0) |
+		                                (_np.diff(levels) != 0)) + 1).tolist()
+		lasts = firsts[1:] + [len(order)]
+		self.runs = [(int(levels[first]), first, last-first)
+		             for first, last in zip(firsts, lasts)]
+		self.du2, self.overlapping = du2, overlapping
+		self.dirty = 0, len(order)
+	
+	def update(self, instances, indices, moved=True):
+		"""update rows of instances at indices (False if a level changed).
+		
+		runs are arranged again when instances moved (or were resized).
+		"""
+		if _np.any(_levels(instances["size"][indices]) != self.levels[indices]):
+			return False
+		if moved or self.runs is None:
+			self.runs = None
+			return True
+		slots = self.slots[indices]
+		indices, slots = indices[slots >= 0], slots[slots >= 0]
+		if len(slots):
+			self.rows[slots] = _rows(instances[indices], self.abcdef)
+			first, last = int(slots.min()), int(slots.max())+1
+			if self.dirty is not None:
+				first, last = min(first, self.dirty[0]), max(last, self.dirty[1])
+			self.dirty = first, last
+		return True
+	
+	def upload(self):
+		"""vbo id of rows, uploading again only the updated ones."""
+		if self.vbo_id is None:
+			_, self.vbo_id = create_vbo(self.rows)
+		elif self.dirty is not None:
+			first, last = self.dirty
+			update_vbo(self.vbo_id, first, self.rows[first:last])
+		self.dirty = None
+		return self.vbo_id
+
+
+# markers ####################################################################
+
+_white = Color(1., 1., 1.) # fill of colored instances
+
+class Markers(Element):
+	"""copies of a template path, from arrays of instances.
+	
+	instances are a numpy structured array with a position, a size (scale of
+	the template, null to hide the instance) and an rgba color. colors, when
+	given, fill the instances whose template does not set its own fill (as
+	would a use element). instances are rendered with instancing, by runs of
+	instances of a scale level in painter's order, and serialized as use
+	elements.
+	"""
+	tag = "g"
+	
+	_state_attributes = Element._state_attributes + [
+		"template", "colored",
+	]
+	
+	_buffer = None
+	
+	def __init__(self, template=None, positions=(), sizes=1., colors=None,
+	             **attributes):
+		if _np is None:
+			raise ImportError("markers need numpy")
+		super(Markers, self).__init__(**attributes)
+		self.template = template
+		self.colored = colors is not None
+		self.instances = _instances(positions, sizes, colors)
+	
+	def __setattr__(self, attribute, value):
+		if attribute == "template" and value is not None:
+			if not isinstance(value, Path):
+				raise TypeError("markers template must be a path, not %s" %
+				                type(value).__name__)
+			value._link(self)
+		elif attribute == "instances":
+			self._buffer = None
+		super(Markers, self).__setattr__(attribute, value)
+	
+	def update(self, index, positions=None, sizes=None, colors=None):
+		"""update instances at index (int, slice or array of indices).
+		
+		only the rows of the updated instances are uploaded again, unless
+		their size changes scale level.
+		"""
+		instances = self.instances
+		indices = _np.atleast_1d(_np.arange(len(instances))[index])
+		if positions is not None:
+			instances["position"][indices] = _np.reshape(positions, (-1, 2))
+		if sizes is not None:
+			instances["size"][indices] = sizes
+		if colors is not None:
+			instances["color"][indices] = _rgba(colors)
+			if not self.colored:
+				self.colored = True
+		moved = positions is not None or sizes is not None
+		if self._buffer is not None and \
+		   not self._buffer.update(instances, indices, moved):
+			self._buffer = None
+		self._invalidate()
+	
+	def _template_inheriteds(self, inheriteds):
+		"""values inherited by the template."""
+		if self.colored:
+			return dict(inheriteds, fill=_white)
+		return inheriteds
+	
+	def _template(self):
+		"""template, inheriting from the last traversal."""
+		inheriteds = self._inherit(self._inheriteds)
+		self.template._inherit(self._template_inheriteds(inheriteds))
+		return self.template
+	
+	def _visible(self):
+		"""whether some instance is visible."""
+		return self.template is not None and bool(_np.any(self.instances["size"] > 0.))
+	
+	
+	# bounds
+	
+	def _boxes(self, du2):
+		"""rows (x_min, y_min, x_max, y_max) of instances bboxes, and visibility.
+		
+		du2 is the surface of a pixel in local coordinates.
+		"""
+		instances = self.instances
+		sizes = instances["size"]
+		visible = sizes > 0.
+		if not visible.any():
+			return _np.zeros((len(instances), 4)), visible
+		s_min = sizes[visible].min()
+		box = _bounds(self._template(), du2*s_min*s_min)
+		if box is None or _empty(box):
+			return _np.zeros((len(instances), 4)), _np.zeros_like(visible)
+		(x_min, y_min), (x_max, y_max) = box
+		positions, sizes = instances["position"], sizes[:, None]
+		boxes = _np.hstack([positions + sizes*(x_min, y_min),
+		                    positions + sizes*(x_max, y_max)])
+		return boxes, visible
+	
+	def _local_bounds(self, du2):
+		if not self._visible():
+			return _bbox([])
+		boxes, visible = self._boxes(du2)
+		if not visible.any():
+			return _bbox([])
+		boxes = boxes[visible]
+		(x_min, y_min), (x_max, y_max) = boxes[:, :2].min(axis=0), \
+		                                 boxes[:, 2:].max(axis=0)
+		return (float(x_min), float(y_min)), (float(x_max), float(y_max))
+	
+	def _aabbox(self, transform, inheriteds, exact=True):
+		if not self._visible():
+			return _bbox([])
+		template = self.template
+		inheriteds = self._template_inheriteds(inheriteds)
+		instances = self.instances
+		levels = _levels(instances["size"])
+		a, b, c, d, e, f = transform.abcdef
+		du2 = _du2(transform)
+		corners = []
+		for level in _np.unique(levels[levels != _HIDDEN]):
+			level_du2 = du2*_scale_du2(level)
+			hull = _parent_hull(template, level_du2, inheriteds) if exact else None
+			if hull is None:
+				template._inherit(inheriteds)
+				box = _bounds(template, level_du2)
+				if box is None or _empty(box):
+					continue
+				(x_min, y_min), (x_max, y_max) = box
+				hull = [(x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)]
+			if not len(hull):
+				continue
+			# instances are scaled copies, their bboxes scale the hull one
+			hx, hy = _np.asarray(hull, dtype="f8").T
+			lx, ly = a*hx+c*hy, b*hx+d*hy
+			selected = instances[levels == level]
+			s = selected["size"]
+			px, py = selected["position"].T
+			x, y = a*px+c*py+e, b*px+d*py+f
+			corners += [(float((x+s*lx.min()).min()), float((y+s*ly.min()).min())),
+			            (float((x+s*lx.max()).max()), float((y+s*ly.max()).max()))]
+		return _bbox([corners])
+	
+	
+	# rendering
+	
+	def _render(self, transform, inheriteds, context):
+		template = self.template
+		if template is None or not template.active:
+			return
+		if not _instancing():
+			self._render_instances(transform, inheriteds, context)
+			return
+		template._inherit(self._template_inheriteds(inheriteds))
+		abcdef = template.matrix().abcdef
+		if self._buffer is None or self._buffer.abcdef != abcdef:
+			self._buffer = _InstancesBuffer(self.instances, abcdef)
+		buffer = self._buffer
+		if not len(buffer.visible):
+			return
+		du2 = _du2(transform)
+		fill = template._color(template.fill)
+		stroke = template._color(template.stroke)
+		stroked = stroke and template.stroke_width > 0.
+		if fill and fill is _white:
+			fill_paints = {
+				"triangles": fill.paint_colored_instanced_triangles,
+				"nonzero":   fill.paint_colored_instanced_nonzero,
+				"evenodd":   fill.paint_colored_instanced_evenodd,
+			}
+		elif fill:
+			fill_paints = {
+				"triangles": fill.paint_instanced_triangles,
+				"nonzero":   fill.paint_instanced_nonzero,
+				"evenodd":   fill.paint_instanced_evenodd,
+			}
+		
+		# geometries of levels, and levels whose instances may overlap within a
+		# run (i.e. drawn as plain triangles)
+		geometries = {}
+		overlapping = set()
+		for level in buffer.visible_levels:
+			level_du2 = du2*_scale_du2(level)
+			fills = strokes = None
+			if fill:
+				triangulated, fills = template._fills_data(level_du2)
+				fills = fill_paints["triangles" if triangulated else
+				                    template.fill_rule], fills
+				if triangulated and not stroked:
+					overlapping.add(level)
+			if stroked:
+				strokes = template._strokes_data(level_du2)
+			geometries[level] = template._local_bbox(level_du2), fills, strokes
+		overlapping = frozenset(overlapping)
+		
+		if not buffer.arranged(du2, overlapping):
+			# boxes margins of the smallest du2 the runs stay arranged for
+			du2_arranged = du2/_ARRANGE_ZOOM
+			boxes, _ = self._boxes(du2_arranged)
+			buffer.arrange(self.instances, boxes, du2_arranged, overlapping)
+		instances_id = buffer.upload()
+		
+		origin = template.x, template.y
+		for level, first, count in buffer.runs:
+			bbox, fills, strokes = geometries[level]
+			if fills:
+				paint, (n, vbo_id) = fills
+				paint(template.fill_opacity,
+				      ((n, count), (vbo_id, instances_id, first)),
+				      transform, context, origin, bbox)
+			if strokes:
+				(n, vbo_id), correction = strokes
+				stroke.paint_instanced_one(template.stroke_opacity * correction,
+				                           ((n, count), (vbo_id, instances_id, first)),
+				                           transform, context, origin, bbox)
+	
+	def _render_instances(self, transform, inheriteds, context):
+		"""render instances one after the other (without instancing)."""
+		inheriteds = self._template_inheriteds(inheriteds)
+		for (x, y), s, (r, g, b, a) in _tolist(self.instances):
+			if not s > 0.:
+				continue
+			values = inheriteds
+			if self.colored:
+				values = dict(inheriteds, fill=Color(r, g, b),
+				              fill_opacity=inheriteds["fill_opacity"]*a)
+			self.template.render(transform*Matrix(s, 0., 0., s, x, y),
+			                     values, context)
+	
+	
+	# picking
+	
+	def _index(self, du2):
+		"""(cell, half, keys, indices, boxes) grid of instances bboxes.
+		
+		indices of visible instances are sorted by key of the cell of their
+		bbox center. cells are twice the largest bbox half side, so that the
+		bboxes containing a point have their center in the 2x2 cells around.
+		"""
+		def index():
+			boxes, visible = self._boxes(du2)
+			indices = _np.flatnonzero(visible)
+			if not len(indices):
+				return 1., 0., _np.zeros(0, dtype="i8"), indices, boxes
+			sides = boxes[indices, 2:] - boxes[indices, :2]
+			half = float(sides.max())/2.
+			cell = 2.*half or 1.
+			keys = _keys(cell, (boxes[indices, :2] + boxes[indices, 2:])/2.)
+			order = _np.argsort(keys, kind="stable")
+			return cell, half, keys[order], indices[order], boxes
+		self._validate()
+		return _cached(self._derived.setdefault("index", {}), self, du2, index)
+	
+	def _candidates(self, box, du2):
+		"""ordered indices of instances whose bbox overlaps box."""
+		cell, half, keys, indices, boxes = self._index(du2)
+		(x_min, y_min), (x_max, y_max) = box
+		i_min, i_max = floor((x_min-half)/cell), floor((x_max+half)/cell)
+		j_min, j_max = floor((y_min-half)/cell), floor((y_max+half)/cell)
+		if i_max-i_min >= _INDEX_SPAN:
+			candidates = indices
+		else:
+			candidates = [indices[_np.searchsorted(keys, i*_KEY+j_min, "left"):
+			                      _np.searchsorted(keys, i*_KEY+j_max, "right")]
+			              for i in range(i_min, i_max+1)]
+			candidates = _np.concatenate(candidates)
+		b = boxes[candidates]
+		overlap = (b[:, 0] <= x_max) & (x_min <= b[:, 2]) & \
+		          (b[:, 1] <= y_max) & (y_min <= b[:, 3])
+		return _np.sort(candidates[overlap])
+	
+	def _instance_transforms(self, transform, indices):
+		"""transforms of the template of instances at indices."""
+		instances = self.instances
+		matrix = self.template.matrix()
+		for i in indices.tolist():
+			(x, y), s = instances["position"][i].tolist(), float(instances["size"][i])
+			yield i, transform*Matrix(s, 0., 0., s, x, y)*matrix
+	
+	def indices_at(self, x, y, transform=Matrix()):
+		"""ordered indices of instances at (x, y) (in transform coordinates)."""
+		return self._indices_at(x, y, transform*self.matrix())
+	
+	def _indices_at(self, x, y, transform):
+		if not self._visible():
+			return []
+		px, py = transform.inverse().project(x, y)
+		candidates = self._candidates(((px, py), (px, py)), _du2(transform))
+		template = self._template()
+		return [i for i, instance_transform in
+		        self._instance_transforms(transform, candidates)
+		        if template._hit_test(x, y, instance_transform)]
+	
+	def indices_in(self, region, transform=Matrix(), contained=False):
+		"""ordered indices of instances intersecting (or contained in) region.
+		
+		region is a polygon (or two opposite corners of a rectangle) in
+		transform coordinates.
+		"""
+		if len(region) == 2:
+			(x0, y0), (x1, y1) = region
+			region = [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+		return self._indices_in(region, transform*self.matrix(), contained)
+	
+	def _indices_in(self, region, transform, contained):
+		if not self._visible():
+			return []
+		box = _bbox([_projections(transform.inverse().abcdef, region)])
+		candidates = self._candidates(box, _du2(transform))
+		template = self._template()
+		return [i for i, instance_transform in
+		        self._instance_transforms(transform, candidates)
+		        if template._region_test(region, instance_transform, contained)]
+	
+	def _hit_test(self, x, y, transform):
+		if self._indices_at(x, y, transform):
+			return [([self], transform.inverse().project(x, y))]
+		return []
+	
+	def _region_test(self, region, transform, contained):
+		indices = self._indices_in(region, transform, contained)
+		if contained:
+			return bool(indices) and \
+			       len(indices) == _np.count_nonzero(self.instances["size"] > 0.)
+		return bool(indices)
+	
+	
+	# tessellation
+	
+	def _tessellables_content(self, transform, inheriteds):
+		if self.template is None:
+			return
+		inheriteds = self._template_inheriteds(inheriteds)
+		levels = _np.unique(_levels(self.instances["size"]))
+		for level in levels[levels != _HIDDEN]:
+			scale = Scale(sqrt(_scale_du2(level)))
+			yield from self.template._tessellables(transform*scale, inheriteds)
+	
+	
+	# serialization
+	
+	def _xml_content(self, defs):
+		if self.template is None:
+			return ""
+		uses = []
+		for (x, y), s, (r, g, b, a) in _tolist(self.instances):
+			if not s > 0.:
+				continue
+			use = Use(self.template, transform=[Translate(x, y), Scale(s)])
+			if self.colored:
+				use.fill = Color(r, g, b)
+				if a < 1.:
+					use.fill_opacity = a
+			uses.append(use._xml(defs))
+		return "\n".join(uses)
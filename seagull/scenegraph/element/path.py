@@ -7,14 +7,30 @@ scenegraph.element.path
 
 # imports ####################################################################
 
+from array import array
 from collections import defaultdict
-from copy import deepcopy
-from math import log, floor, sqrt
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import blake2b
+from itertools import chain
+from math import log, floor, sqrt, hypot, frexp
+from os import cpu_count
 
 from ...opengl.utils import create_vbo
-from . import Element
-from ._path import (_cubic, _quadric, _arc, _stroke,
-                    _evenodd_hit, _nonzero_hit, _stroke_hit, _bbox)
+from . import Element, _INHERITEDS
+from ..paint import Color
+from ..transform import Scale
+from ._cache import (cache_manager, _POINT_SIZE, _VERTEX_SIZE,
+                     _points_size, _vbo_size)
+from ._tessellator import tessellator
+from ._path import (_cubic, _quadric, _arc, _arc_controls, _stroke,
+                    _extrusions,
+                    _cubic_quadrics, _arc_quadrics, _quadrics_extrema,
+                    _edges_index, _evenodd_index_hit, _nonzero_index_hit,
+                    _triangles_index, _stroke_index_hit,
+                    _windings, _stroke_index_hits, _projections,
+                    _points, _winding, _strip_triangles,
+                    _region_intersects, _region_contains, _hull, _bbox,
+                    _triangulation, _colored_projections)
 
 
 # flattening #################################################################
@@ -49,6 +65,11 @@ def _flatten(path_data, du2=1.):
 		else:
 			next_x = next_y = next_p = next_d
 		
+		if not path and c not in "MZ":
+			# the current point starts the subpath (after a 'Z')
+			path = [p0]
+			joins = [0]
+		
 		if c == 'M':
 			p1 = next_p()
 			if path:
@@ -92,7 +113,7 @@ def _flatten(path_data, du2=1.):
 			path += _arc(p0, rs, phi, flags, p1, du2)
 			pn, p0 = p0, p1
 		
-		elif c == 'Z':
+		elif c == 'Z' and path:
 			x1, y1 = p1 = path[0]
 			dx, dy = x1-x0, y1-y0
 			if (dx*dx+dy*dy)*du2 > 1.:
@@ -111,6 +132,137 @@ def _flatten(path_data, du2=1.):
 	return paths
 
 
+def _segments(path_data):
+	"""absolute segments of path data.
+	
+	segments are ('M', p0, p1), ('L', p0, p1), ('Q', p0, c, p1),
+	('C', p0, c0, c1, p1), ('A', p0, rs, phi, flags, p1) and ('Z', p0, p1),
+	where p0 is the current point and p1 the new one.
+	"""
+	path_data_iter = iter(path_data)
+	def next_d():
+		return next(path_data_iter)
+	
+	pn = p0 = pm = (0., 0.)
+	cn = None
+	for c in path_data_iter:
+		x0, y0 = p0
+		xn, yn = pn
+		
+		if c.islower():
+			def next_p():
+				dx, dy = next_d()
+				return (x0+dx, y0+dy)
+			def next_x():
+				dx = next_d()
+				return x0+dx
+			def next_y():
+				dy = next_d()
+				return y0+dy
+			c = c.upper()
+		else:
+			next_x = next_y = next_p = next_d
+		
+		if c == 'M':
+			p1 = pm = next_p()
+			yield 'M', p0, p1
+			pn, p0 = p0, p1
+		
+		elif c in "LHV":
+			if c == 'L':
+				p1 = next_p()
+			elif c == 'H':
+				p1 = (next_x(), y0)
+			elif c == 'V':
+				p1 = (x0, next_y())
+			yield 'L', p0, p1
+			pn, p0 = p0, p1
+		
+		elif c in "CS":
+			if c == 'C':
+				p1 = next_p()
+			else: # 'S'
+				p1 = (2.*x0-xn, 2*y0-yn) if cn in "CS" else p0
+			p2, p3 = next_p(), next_p()
+			yield 'C', p0, p1, p2, p3
+			pn, p0 = p2, p3
+		
+		elif c in 'QT':
+			if c == 'Q':
+				p1 = next_p()
+			else: # 'T'
+				p1 = (2.*x0-xn, 2*y0-yn) if cn in "QT" else p0
+			p2 = next_p()
+			yield 'Q', p0, p1, p2
+			pn, p0 = p1, p2
+		
+		elif c == 'A':
+			rs, phi, flags = next_d(), next_d(), next_d()
+			p1 = next_p()
+			yield 'A', p0, rs, phi, flags, p1
+			pn, p0 = p0, p1
+		
+		elif c == 'Z':
+			yield 'Z', p0, pm
+			pn, p0 = p0, pm
+		
+		cn = c
+
+
+def _control_points(path_data):
+	"""points whose convex hull contains the path, without flattening."""
+	points = []
+	for segment in _segments(path_data):
+		if segment[0] == 'A':
+			points += _arc_controls(*segment[1:])
+		else:
+			points += segment[2:]
+	return points
+
+
+def _curves(path_data):
+	"""polygons and quadric curves of path, without flattening.
+	
+	polygons join the end points of segments, while (p0, p1, p2) quadrics
+	cover the space between curved segments and their chords.
+	"""
+	paths, curves = [], []
+	path = []
+	for segment in _segments(path_data):
+		c, p0, p1 = segment[0], segment[1], segment[-1]
+		if c == 'M':
+			if path:
+				paths.append((path, False, []))
+			path = [p1]
+			continue
+		
+		if not path:
+			path = [p0]
+		if c == 'Q':
+			quadrics = [segment[2:]]
+		elif c == 'C':
+			quadrics = _cubic_quadrics(*segment[1:])
+		elif c == 'A':
+			quadrics = _arc_quadrics(*segment[1:])
+		else: # 'L', 'Z'
+			quadrics = []
+		for control, end in quadrics:
+			curves.append((p0, control, end))
+			path.append(end)
+			p0 = end
+		if not quadrics:
+			path.append(p1)
+		
+		if c == 'Z':
+			paths.append((path, True, []))
+			path = []
+	
+	if path:
+		paths.append((path, False, []))
+	
+	return paths, curves
+
+
 # utils ######################################################################
 
 _WIDTH_LIMIT = 1.
@@ -130,6 +282,11 @@ def _scale_index(du2, scale_step=_SCALE_STEP):
 		return None
 
 
+def _scale_du2(scale_index, scale_step=_SCALE_STEP):
+	"""du2 in the middle of the range discretized by scale index."""
+	return scale_step**(2*scale_index+1)
+
+
 def _strip_range(stop):
 	"""sort verticies in triangle strip order, i.e. 0 -1 1 -2 2 ..."""
 	i = 0
@@ -152,45 +309,212 @@ def _join_strips(strips):
 	return strip
 
 
+def _fill_strip(paths):
+	"""triangle strip covering the interior of discretized paths."""
+	return _join_strips([path[i] for i in _strip_range(len(path))]
+	                    for path, _, _ in paths)
+
+
+def _stroke_strip(paths, width, du=1., cap='butt', join='miter', miterlimit=4.):
+	"""triangle strip covering the strokes of discretized paths."""
+	return _join_strips(_stroke(path, closed, joins, width, du,
+	                            cap, join, miterlimit)
+	                    for path, closed, joins in paths)
+
+
+def _fill_geometry(paths):
+	"""(triangulated, points) covering the interior of discretized paths.
+	
+	simple paths are triangulated to be drawn in a single pass, others get a
+	triangle strip for stencil and cover passes.
+	"""
+	triangles = _triangulation(paths)
+	if triangles is not None:
+		return True, triangles
+	return False, _fill_strip(paths)
+
+
+# numpy engine ###############################################################
+
+try:
+	from ._path_numpy import (_flatten, _fill_strip, _stroke_strip, _bbox,
+	                          _windings, _stroke_index_hits, _projections,
+	                          _hull, _extrusions, _colored_projections)
+except ImportError:
+	pass
+
+
+# thin strokes ###############################################################
+
+def _stroke_data(paths, du2, width, miterlimit, cap, join):
+	"""stroke strip and opacity correction for better thin stroke rendering."""
+	du = sqrt(du2)
+	adapt_width = width * du
+	if adapt_width < _WIDTH_LIMIT:
+		width = 1./du
+		opacity_correction = adapt_width
+	else:
+		opacity_correction = 1.
+	
+	return _stroke_strip(paths, width, du, cap, join, miterlimit), opacity_correction
+
+
+# extruded strokes ###########################################################
+
+def _extruded_stroke_data(paths, du2, miterlimit, cap, join, level):
+	"""(x, y, dx, dy) stroke strip vertices, (dx, dy) scaled by half width.
+	
+	stroke vertices are affine in the half width as long as round caps and
+	joins keep the same subdivision, which is set by the level half width.
+	"""
+	du = sqrt(du2)
+	strip1 = _stroke_strip(paths, 2., level*du, cap, join, miterlimit)
+	strip2 = _stroke_strip(paths, 4., level*du/2., cap, join, miterlimit)
+	return _extrusions(strip1, strip2)
+
+
+# cover quads ################################################################
+
+def _cover(bbox, *attributes):
+	"""triangle strip of bbox, vertices followed by attributes."""
+	(x_min, y_min), (x_max, y_max) = bbox
+	if x_min > x_max or y_min > y_max:
+		x_min = y_min = x_max = y_max = 0.
+	return [(x, y, *attributes) for y in (y_min, y_max) for x in (x_min, x_max)]
+
+def _strip_cover(strip):
+	"""cover quad of the bbox of a triangle strip."""
+	return _cover(_bbox([strip]) if len(strip) else _bbox([]))
+
+def _extruded_cover(bbox, margin):
+	"""cover quad of bbox, extruded by margin times the half width."""
+	return [(x, y, dx*margin, dy*margin)
+	        for (x, y), (dx, dy) in zip(_cover(bbox),
+	                                    [(-1, -1), (1, -1), (-1, 1), (1, 1)])]
+
+def _covered_vbo(points, cover):
+	"""(n, vbo) of points followed by their cover quad (n excludes it)."""
+	n, vbo_id = create_vbo(points, cover)
+	return n-len(cover), vbo_id
+
+
 # cache ######################################################################
 
 def _fill_state(path):
-	return path.d
+	return (path._generation,)
 
 def _stroke_state(path):
-	return (
-		path.d,
-		path.stroke_width, path.stroke_miterlimit,
-		path.stroke_linecap, path.stroke_linejoin,
-	)
+	return (path._generation,) + path._stroke_parameters()
+
+def _extrusion_state(path):
+	return (path._generation,) + path._extrusion_parameters()
+
+def _bbox_size(bbox):
+	return 2 * _POINT_SIZE
+
+def _fills_size(fills):
+	_, points = fills
+	return _points_size(points)
 
-def _cache(_state):
+def _fills_data_size(fills_data):
+	_, vbo = fills_data
+	return _vbo_size(vbo)
+
+def _paths_size(paths):
+	return sum(_points_size(path) for path, _, _ in paths)
+
+def _strokes_size(strokes):
+	strokes, _ = strokes
+	return _points_size(strokes)
+
+def _strokes_data_size(strokes_data):
+	vbo, _ = strokes_data
+	return _vbo_size(vbo)
+
+def _curve_fills_size(curve_fills):
+	_, vertices, _ = curve_fills
+	return len(vertices) * 2*_POINT_SIZE
+
+def _curve_fills_data_size(curve_fills_data):
+	(n, m), _ = curve_fills_data
+	return (n+m) * 2*_VERTEX_SIZE
+
+def _extrusions_size(extrusions):
+	try:
+		return extrusions.nbytes
+	except AttributeError:
+		return len(extrusions) * 2*_POINT_SIZE
+
+def _extrusions_data_size(extrusions_data):
+	n, _ = extrusions_data
+	return n * 2*_VERTEX_SIZE
+
+def _edges_index_size(index):
+	if index is None:
+		return 0
+	_, _, bands = index
+	return sum(len(band) for band in bands) * 2 * _POINT_SIZE
+
+def _triangles_index_size(index):
+	if index is None:
+		return 0
+	_, _, _, _, cells = index
+	return sum(len(cell) for cell in cells.values()) * 3 * _POINT_SIZE
+
+def _cache(_state, _size, _geometry=None):
 	"""caching decorator
 	
 	cache is a dict maintained by path element mapping scale index to data
+	entries are accounted by the global cache manager (using size function)
+	which evicts the least recently used ones when over budget
 	the cache is cleared if the state characterized by attributes has changed
+	geometry is characterized by a generation counter, so that checking the
+	state does not depend on the size of the path data
+	the cache is shared by paths with same content, i.e. same path data digest
+	and same state (but generation)
+	_geometry (if given) computes data from flattened paths, du2 and state
+	(but generation), i.e. without reading the path
 	"""
 	def decorator(method):
-		def decorated(path, du2=1.):
+		def cache_of(path):
 			state = _state(path)
 			if state != path._states.get(method, None):
-				path._caches[method] = cache = {}
-				path._states[method] = deepcopy(state)
-				path._bbox_du2 = 0.
+				_, *content = state
+				key = (method.__name__, path._digest(), *content)
+				path._caches[method] = cache = cache_manager.cache(key)
+				path._states[method] = state
 			else:
 				cache = path._caches[method]
+			return cache
+		def decorated(path, du2=1.):
+			cache = cache_of(path)
 			scale_index = _scale_index(du2)
 			try:
-				result = cache[scale_index]
+				result = cache_manager.get(cache, scale_index)
 			except KeyError:
-				cache[scale_index] = result = method(path, du2)
+				result = method(path, du2)
+				cache_manager.set(cache, scale_index, result, _size(result))
 			return result
+		def put(path, du2, result, cache=None):
+			if cache is None:
+				cache = cache_of(path)
+			cache_manager.set(cache, _scale_index(du2), result, _size(result))
+		def snapshot(path):
+			"""cache and geometry function of the current state of path."""
+			cache = cache_of(path)
+			_, *parameters = path._states[method]
+			return cache, lambda paths, du2: _geometry(paths, du2, *parameters)
+		decorated.cache_of = cache_of
+		decorated.put = put
+		decorated.snapshot = snapshot
 		return decorated
 	return decorator
 
 
 # path #######################################################################
 
+_IDENTITY = 1., 0., 0., 1., 0., 0.
+
 class Path(Element):
 	tag = "path"
 	
@@ -198,8 +522,13 @@ class Path(Element):
 		"d",
 	]
 	
-	_bbox = (0., 0.), (0., 0.)
-	_bbox_du2 = 0.
+	_geometry_attributes = ["d"]
+	_generation = 0
+	_digests = None, None
+	_controls = None, None
+	
+	curve_fills = False # fills curves in fragment shader, at any scale
+	extruded_strokes = False # applies strokes width in vertex shader
 
 	def __init__(self, **attributes):
 		super(Path, self).__init__(**attributes)
@@ -207,67 +536,206 @@ class Path(Element):
 		self._states = {}
 		self.active = True
 	
-	@_cache(_fill_state)
+	def __setattr__(self, attribute, value):
+		if attribute in self._geometry_attributes:
+			self._generation += 1
+		super(Path, self).__setattr__(attribute, value)
+	
+	def __delattr__(self, attribute):
+		super(Path, self).__delattr__(attribute)
+		if attribute in self._geometry_attributes:
+			self._generation += 1
+	
+	def _digest(self):
+		"""digest of path data, identifying geometry across paths."""
+		generation, digest = self._digests
+		if generation != self._generation:
+			digest = blake2b(repr(self.d).encode(), digest_size=16).digest()
+			self._digests = self._generation, digest
+		return digest
+	
+	@_cache(_fill_state, _paths_size)
 	def _paths(self, du2=1.):
-		paths = _flatten(self.d, du2)
-		if du2 > self._bbox_du2:
-			self._bbox_du2 = du2
-			self._bbox = _bbox(path for (path, _, _) in paths)
-		return paths
+		return _flatten(self.d, du2)
+	
+	@_cache(_fill_state, _bbox_size)
+	def _local_bbox(self, du2=1.):
+		return _bbox(path for (path, _, _) in self._paths(du2))
 	
-	@_cache(_fill_state)
+	@_cache(_fill_state, _fills_size, lambda paths, du2: _fill_geometry(paths))
 	def _fills(self, du2=1.):
-		paths = self._paths(du2)
-		return _join_strips([path[i] for i in _strip_range(len(path))]
-		                    for path, _, _ in paths)
+		return _fill_geometry(self._paths(du2))
 	
-	@_cache(_fill_state)
+	@_cache(_fill_state, _fills_data_size)
 	def _fills_data(self, du2):
-		fills = self._fills(du2)
-		return create_vbo(fills)
+		triangulated, fills = self._fills(du2)
+		if triangulated: # single pass, no cover
+			return triangulated, create_vbo(fills)
+		return triangulated, _covered_vbo(fills, _cover(self._local_bbox(du2)))
 	
+	@_cache(_fill_state, _points_size)
+	def _fills_hull(self, du2=1.):
+		return _hull([p for (path, _, _) in self._paths(du2) for p in _points(path)])
 	
-	@_cache(_stroke_state)
-	def _strokes(self, du2=1.):
-		paths = self._paths(du2)
-		
-		# better thin stroke rendering
-		du = sqrt(du2)
-		adapt_width = self.stroke_width * du
-		if adapt_width < _WIDTH_LIMIT:
-			width = 1./du
-			opacity_correction = adapt_width
-		else:
-			width = self.stroke_width
-			opacity_correction = 1.
+	@_cache(_fill_state, _curve_fills_size)
+	def _curve_fills(self, du2=1.):
+		"""vertices of the polygons strip and curves triangles, and bbox.
 		
-		return _join_strips(_stroke(path, closed, joins, width, du,
-		                            self.stroke_linecap, self.stroke_linejoin,
-		                            self.stroke_miterlimit)
-		                    for path, closed, joins in paths), opacity_correction
+		vertices carry (u, v) curve coordinates, fragments where u²>v are
+		outside curves. geometry does not depend on scale, a single level is
+		cached whatever du2.
+		"""
+		paths, curves = _curves(self.d)
+		strip = _fill_strip(paths)
+		vertices = [(x, y, 0., 1.) for x, y in strip]
+		for (x0, y0), (x1, y1), (x2, y2) in curves:
+			# reversed, as strip triangles wind against the path direction
+			vertices += [(x2, y2, 1., 1.), (x1, y1, .5, 0.), (x0, y0, 0., 0.)]
+		extrema = _quadrics_extrema(curves)
+		bbox = _bbox([path for path, _, _ in paths] + ([extrema] if extrema else []))
+		return (len(strip), 3*len(curves)), vertices, bbox
+	
+	@_cache(_fill_state, _curve_fills_data_size)
+	def _curve_fills_data(self, du2=1.):
+		counts, vertices, bbox = self._curve_fills()
+		_, vbo_id = create_vbo(vertices, _cover(bbox, 0., 1.))
+		return counts, vbo_id
+	
+	@_cache(_fill_state, _edges_index_size)
+	def _fills_index(self, du2=1.):
+		return _edges_index(self._paths(du2))
 	
-	@_cache(_stroke_state)
+	
+	def _stroke_parameters(self):
+		return (self.stroke_width, self.stroke_miterlimit,
+		        self.stroke_linecap, self.stroke_linejoin)
+	
+	@_cache(_stroke_state, _strokes_size, _stroke_data)
+	def _strokes(self, du2=1.):
+		return _stroke_data(self._paths(du2), du2, *self._stroke_parameters())
+	
+	@_cache(_stroke_state, _strokes_data_size)
 	def _strokes_data(self, du2):
 		strokes, opacity_correction = self._strokes(du2)
-		return create_vbo(strokes), opacity_correction
+		return _covered_vbo(strokes, _strip_cover(strokes)), opacity_correction
 	
+	def _extrusion_parameters(self):
+		"""stroke parameters but width, only its level for round ones."""
+		level = 1.
+		if 'round' in (self.stroke_linecap, self.stroke_linejoin):
+			_, e = frexp(self.stroke_width/2.)
+			level = 2.**e
+		return self.stroke_miterlimit, self.stroke_linecap, self.stroke_linejoin, level
 	
-	def _aabbox(self, transform, inheriteds):
-		du2 = _du2(transform)
-		
-		points = []
+	@_cache(_extrusion_state, _extrusions_size, _extruded_stroke_data)
+	def _extruded_strokes(self, du2=1.):
+		return _extruded_stroke_data(self._paths(du2), du2,
+		                             *self._extrusion_parameters())
+	
+	@_cache(_extrusion_state, _extrusions_data_size)
+	def _extruded_strokes_data(self, du2):
+		cover = _extruded_cover(self._local_bbox(du2), self._stroke_margin(2.))
+		return _covered_vbo(self._extruded_strokes(du2), cover)
+	
+	@_cache(_stroke_state, _points_size)
+	def _strokes_hull(self, du2=1.):
+		strokes, _ = self._strokes(du2)
+		return _hull(strokes)
+	
+	@_cache(_stroke_state, _triangles_index_size)
+	def _strokes_index(self, du2=1.):
+		strokes, _ = self._strokes(du2)
+		return _triangles_index(strokes)
+	
+	
+	def _local_hull(self, du2, inheriteds):
+		hulls = []
 		if self.fill:
-			fills = self._fills(du2)
-			if fills:
-				points.append(transform.project(*p) for p in fills)
+			hulls.append(self._fills_hull(du2))
 		if self.stroke and self.stroke_width > 0.:
-			strokes, _ = self._strokes(du2)
-			if strokes:
-				points.append(transform.project(*p) for p in strokes)
+			hulls.append(self._strokes_hull(du2))
+		if len(hulls) == 1:
+			return hulls[0]
+		return _hull([p for hull in hulls for p in hull])
+	
+	def _control_hull(self):
+		"""convex hull of control points, containing the unstroked path."""
+		generation, hull = self._controls
+		if generation != self._generation:
+			hull = _hull(_control_points(self.d))
+			self._controls = self._generation, hull
+		return hull
+	
+	def _stroke_margin(self, width):
+		"""distance bounding how far the stroke extends out of the path."""
+		factor = max(
+			# clipped miters corners lie off the miter axis
+			hypot(self.stroke_miterlimit, 1.) if self.stroke_linejoin == 'miter' else 1.,
+			sqrt(2.) if self.stroke_linecap == 'square' else 1.,
+		)
+		return width/2. * factor
+	
+	def _aabbox(self, transform, inheriteds, exact=True):
+		if exact:
+			hull = self._local_hull(_du2(transform), inheriteds)
+		elif self.fill or (self.stroke and self.stroke_width > 0.):
+			hull = self._control_hull()
+		else:
+			hull = []
+		if not hull:
+			return _bbox([])
+		bbox = _bbox([_projections(transform.abcdef, hull)])
+		if exact or not (self.stroke and self.stroke_width > 0.):
+			return bbox
 		
-		return _bbox(points)
+		(x_min, y_min), (x_max, y_max) = bbox
+		a, b, c, d, _, _ = transform.abcdef
+		du2 = _du2(transform)
+		margin = 1./sqrt(du2) if du2 > 0. else 0. # a pixel
+		margin = self._stroke_margin(max(self.stroke_width, margin))
+		mx, my = margin*hypot(a, c), margin*hypot(b, d)
+		return (x_min-mx, y_min-my), (x_max+mx, y_max+my)
 	
 	
+	def _tessellated_du2(self, du2, tessellate, *uploads):
+		"""du2 of the scale level to render.
+		
+		with background tessellation, missing scale levels (and neighbours)
+		are scheduled, while the nearest already tessellated level is used.
+		jobs compute from the path data and state (including inherited values)
+		of the scheduling time, and store in the caches of that state.
+		"""
+		scale_index = _scale_index(du2)
+		if not tessellator.enabled or scale_index is None:
+			return du2
+		
+		cache, geometry = tessellate.snapshot(self)
+		levels = set(cache_manager.keys(cache))
+		for upload in uploads:
+			levels.update(cache_manager.keys(upload.cache_of(self)))
+		
+		indices = [scale_index+1, scale_index-1]
+		if levels: # otherwise current level is tessellated synchronously
+			indices.insert(0, scale_index)
+		missing = [index for index in indices if index not in levels]
+		if missing:
+			d = self.d
+			paths_cache = Path._paths.cache_of(self)
+			bbox_cache = Path._local_bbox.cache_of(self)
+			for index in missing:
+				def job(du2=_scale_du2(index)):
+					paths = _flatten(d, du2)
+					bbox = _bbox(path for (path, _, _) in paths)
+					Path._paths.put(self, du2, paths, paths_cache)
+					Path._local_bbox.put(self, du2, bbox, bbox_cache)
+					tessellate.put(self, du2, geometry(paths, du2), cache)
+				tessellator.schedule((id(cache), index), job)
+		
+		if not levels or scale_index in levels:
+			return du2
+		nearest = min(levels, key=lambda index: abs(index-scale_index))
+		return _scale_du2(nearest)
+	
 	def _render(self, transform, inheriteds, context):
 		if not self.active:
 			return
@@ -275,19 +743,73 @@ class Path(Element):
 		origin = self.x, self.y
 		
 		fill = self._color(self.fill)
-		if fill:
-			fills = self._fills_data(du2)
+		if fill and self.curve_fills:
+			fills = self._curve_fills_data()
+			_, _, bbox = self._curve_fills()
 			paint = {
-				"nonzero": fill.paint_nonzero,
-				"evenodd": fill.paint_evenodd,
+				"nonzero": fill.paint_curves_nonzero,
+				"evenodd": fill.paint_curves_evenodd,
 			}[self.fill_rule]
-			paint(self.fill_opacity, fills, transform, context, origin, self._bbox)
+			paint(self.fill_opacity, fills, transform, context, origin, bbox)
+		elif fill:
+			fill_du2 = self._tessellated_du2(du2, Path._fills, Path._fills_data)
+			triangulated, fills = self._fills_data(fill_du2)
+			bbox = self._local_bbox(fill_du2)
+			if triangulated:
+				paint = fill.paint_triangles
+			else:
+				paint = {
+					"nonzero": fill.paint_nonzero,
+					"evenodd": fill.paint_evenodd,
+				}[self.fill_rule]
+			paint(self.fill_opacity, fills, transform, context, origin, bbox)
 		
 		stroke = self._color(self.stroke)
-		if stroke and self.stroke_width > 0.:
-			strokes, correction = self._strokes_data(du2)
+		if stroke and self.stroke_width > 0. and self.extruded_strokes:
+			stroke_du2 = self._tessellated_du2(du2, Path._extruded_strokes,
+			                                   Path._extruded_strokes_data)
+			strokes = self._extruded_strokes_data(stroke_du2)
+			bbox = self._local_bbox(stroke_du2)
+			width, opacity = self.stroke_width, self.stroke_opacity
+			adapt_width = width * sqrt(du2)
+			if adapt_width < _WIDTH_LIMIT: # see _stroke_data
+				width, opacity = width/adapt_width, opacity*adapt_width
+			stroke.paint_extruded_one(opacity, strokes, transform, context,
+			                          origin, bbox, width/2.)
+		elif stroke and self.stroke_width > 0.:
+			stroke_du2 = self._tessellated_du2(du2, Path._strokes, Path._strokes_data)
+			strokes, correction = self._strokes_data(stroke_du2)
+			bbox = self._local_bbox(stroke_du2)
 			opacity = self.stroke_opacity * correction
-			stroke.paint_one(opacity, strokes, transform, context, origin, self._bbox)
+			stroke.paint_one(opacity, strokes, transform, context, origin, bbox)
+	
+	
+	def _draws_content(self, inheriteds, du2):
+		if not self.active:
+			return []
+		if self.curve_fills or self.extruded_strokes or \
+		   type(self)._render is not Path._render:
+			return None
+		abcdef = _IDENTITY
+		draws = []
+		
+		fill = self._color(self.fill)
+		if fill:
+			if not isinstance(fill, Color):
+				return None
+			triangulated, fills = self._fills(du2)
+			kind = "triangles" if triangulated else self.fill_rule
+			draws.append((kind, fill, self.fill_opacity, fills,
+			              _cover(self._local_bbox(du2)), abcdef))
+		
+		stroke = self._color(self.stroke)
+		if stroke and self.stroke_width > 0.:
+			if not isinstance(stroke, Color):
+				return None
+			strokes, correction = self._strokes(du2)
+			draws.append(("one", stroke, self.stroke_opacity * correction,
+			              strokes, _strip_cover(strokes), abcdef))
+		return [(abcdef, draws)] if draws else []
 	
 	
 	def _hit_test(self, x, y, transform):
@@ -296,19 +818,171 @@ class Path(Element):
 		hit = False
 		
 		if not hit and self.fill:
-			(x_min, y_min), (x_max, y_max) = self._bbox
+			(x_min, y_min), (x_max, y_max) = self._local_bbox(du2)
 			if (x_min <= x <= x_max) and (y_min <= y <= y_max):
-				fills = self._fills(du2)
-				if fills:
-					fill_hit = {
-						"nonzero": _nonzero_hit,
-						"evenodd": _evenodd_hit,
-					}[self.fill_rule]
-					hit = fill_hit(x, y, fills)
+				fill_hit = {
+					"nonzero": _nonzero_index_hit,
+					"evenodd": _evenodd_index_hit,
+				}[self.fill_rule]
+				hit = fill_hit(x, y, self._fills_index(du2))
 
 		if not hit and self.stroke and self.stroke_width > 0.:
-			strokes, _ = self._strokes(du2)
-			if strokes:
-				hit = _stroke_hit(x, y, strokes)
+			hit = _stroke_index_hit(x, y, self._strokes_index(du2))
 		
 		return [([self], (x, y))] if hit else []
+	
+	def _hit_test_many(self, points, transform):
+		points = _projections(transform.inverse().abcdef, points)
+		du2 = _du2(transform)
+		hits = [False] * len(points)
+		
+		if self.fill:
+			(x_min, y_min), (x_max, y_max) = self._local_bbox(du2)
+			inside = [i for i, (x, y) in enumerate(points)
+			          if (x_min <= x <= x_max) and (y_min <= y <= y_max)]
+			if inside:
+				windings = _windings([points[i] for i in inside],
+				                     self._fills_index(du2))
+				fill_hit = {
+					"nonzero": lambda winding: winding != 0,
+					"evenodd": lambda winding: (winding % 2) == 1,
+				}[self.fill_rule]
+				for i, winding in zip(inside, windings):
+					hits[i] = fill_hit(winding)
+		
+		if self.stroke and self.stroke_width > 0.:
+			missed = [i for i, hit in enumerate(hits) if not hit]
+			if missed:
+				stroke_hits = _stroke_index_hits([points[i] for i in missed],
+				                                 self._strokes_index(du2))
+				for i, hit in zip(missed, stroke_hits):
+					hits[i] = hit
+		
+		return [[([self], point)] if hit else []
+		        for point, hit in zip(points, hits)]
+	
+	
+	def _region_test(self, region, transform, contained):
+		region = _projections(transform.inverse().abcdef, region)
+		du2 = _du2(transform)
+		
+		geometries = []
+		if self.fill:
+			fill_index = self._fills_index(du2)
+			fill_hit = {
+				"nonzero": lambda winding: winding != 0,
+				"evenodd": lambda winding: (winding % 2) == 1,
+			}[self.fill_rule]
+			polygons = [_points(path) for path, _, _ in self._paths(du2)]
+			inside = lambda x, y: fill_hit(_winding(x, y, fill_index))
+			geometries.append((polygons, inside))
+		if self.stroke and self.stroke_width > 0.:
+			strokes, _ = self._strokes(du2)
+			stroke_index = self._strokes_index(du2)
+			polygons = _strip_triangles(strokes)
+			inside = lambda x, y: _stroke_index_hit(x, y, stroke_index)
+			geometries.append((polygons, inside))
+		geometries = [(polygons, inside) for polygons, inside in geometries
+		              if polygons]
+		
+		if not geometries:
+			return False
+		if contained:
+			return all(_region_contains(polygons, region)
+			           for polygons, _ in geometries)
+		return any(_region_intersects(polygons, region, inside)
+		           for polygons, inside in geometries)
+	
+	def _local_bounds(self, du2):
+		hull = self._control_hull()
+		if not hull:
+			return _bbox([])
+		(x_min, y_min), (x_max, y_max) = _bbox([hull])
+		margin = 1./sqrt(du2) # a pixel
+		if self.stroke and self.stroke_width > 0.:
+			margin += self._stroke_margin(max(self.stroke_width, margin))
+		return (x_min-margin, y_min-margin), (x_max+margin, y_max+margin)
+	
+	
+	def _tessellables_content(self, transform, inheriteds):
+		yield self, transform, self._inheriteds
+
+
+# multiprocess tessellation ##################################################
+
+def _pack(points):
+	"""compact array of points for transfer between processes."""
+	if hasattr(points, "nbytes"):
+		return points
+	return array('d', chain.from_iterable(points))
+
+def _unpack(points):
+	if hasattr(points, "nbytes"):
+		return points
+	coordinates = iter(points)
+	return list(zip(coordinates, coordinates))
+
+def _tessellate(item):
+	"""flatten, fill and stroke path data (in worker process)."""
+	d, du2, fill, stroke = item
+	paths = _flatten(d, du2)
+	bbox = _bbox(path for (path, _, _) in paths)
+	if fill:
+		triangulated, fills = _fill_geometry(paths)
+		fills = triangulated, _pack(fills)
+	else:
+		fills = None
+	if stroke:
+		strokes, opacity_correction = _stroke_data(paths, du2, *stroke)
+		strokes = _pack(strokes), opacity_correction
+	else:
+		strokes = None
+	paths = [(_pack(path), closed, joins) for (path, closed, joins) in paths]
+	return paths, bbox, fills, strokes
+
+def tessellate(element, scale=1., workers=None):
+	"""tessellate all paths of element at scale with a pool of processes.
+	
+	results are stored in path caches, so that first rendering (or bbox
+	computation) at that scale does not need to flatten anything (as long as
+	it fits in the cache manager budget).
+	paths with same content are tessellated once.
+	"""
+	items = {}
+	for path, transform, inheriteds in element._tessellables(Scale(scale),
+	                                                           _INHERITEDS):
+		path._inherit(inheriteds)
+		du2 = _du2(transform)
+		fill = bool(path.fill)
+		stroke = None
+		if path.stroke and path.stroke_width > 0.:
+			stroke = path._stroke_parameters()
+		key = path._digest(), _scale_index(du2), fill, stroke
+		try:
+			item, users = items[key]
+		except KeyError:
+			item, users = items[key] = (path.d, du2, fill, stroke), []
+		users.append((path, inheriteds))
+	
+	if not items:
+		return
+	
+	items, users = zip(*items.values())
+	workers = workers or cpu_count() or 1
+	chunksize = max(1, len(items) // (4*workers))
+	with ProcessPoolExecutor(workers) as executor:
+		results = executor.map(_tessellate, items, chunksize=chunksize)
+		for (_, du2, _, _), users, (paths, bbox, fills, strokes) in zip(items, users, results):
+			paths = [(_unpack(path), closed, joins) for (path, closed, joins) in paths]
+			if fills is not None:
+				fills = fills[0], _unpack(fills[1])
+			if strokes is not None:
+				strokes = _unpack(strokes[0]), strokes[1]
+			for path, inheriteds in users:
+				path._inherit(inheriteds)
+				Path._paths.put(path, du2, paths)
+				Path._local_bbox.put(path, du2, bbox)
+				if fills is not None:
+					Path._fills.put(path, du2, fills)
+				if strokes is not None:
+					Path._strokes.put(path, du2, strokes)
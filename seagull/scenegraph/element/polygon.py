@@ -15,6 +15,8 @@ from .path import Path
 class Polygon(Path):
 	tag = "polygon"
 	
+	_geometry_attributes = ["points"]
+	
 	points = []
 	
 	@property
@@ -15,6 +15,8 @@ from .path import Path
 class Polyline(Path):
 	tag = "polyline"
 	
+	_geometry_attributes = ["points"]
+	
 	points = []
 	
 	@property
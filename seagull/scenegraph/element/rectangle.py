@@ -15,6 +15,8 @@ from .path import Path
 class Rectangle(Path):
 	tag = "rect"
 	
+	_geometry_attributes = ["width", "height", "rx", "ry"]
+	
 	width, height = 0, 0
 	rx, ry = None, None
 	
@@ -61,7 +61,6 @@ class Text(Element):
 		self._width = width
 		self._text_bbox.x, self._text_bbox.width  = x, width
 		self._text_bbox.y, self._text_bbox.height = y, height
-		self._text_bbox._paths() # force bbox update
 
 	@property
 	def font_face(self):
@@ -87,8 +86,9 @@ class Text(Element):
 			'end':    -self._width,
 		}[self.text_anchor]
 	
-	def _aabbox(self, transform, inheriteds):
-		return self._text_bbox.aabbox(transform * Translate(self._anchor()), inheriteds)
+	def _aabbox(self, transform, inheriteds, exact=True):
+		return self._text_bbox.aabbox(transform * Translate(self._anchor()),
+		                              inheriteds, exact)
 	
 	def _render(self, transform, inheriteds, context):
 		font_size = self.font_size
@@ -201,6 +201,11 @@ class Text(Element):
 	def _hit_test(self, x, y, transform):
 		return self._text_bbox.pick(x, y, transform*Translate(self._anchor()))
 	
+	def _region_test(self, region, transform, contained):
+		return bool(self._text_bbox.pick_region(region,
+		                                        transform*Translate(self._anchor()),
+		                                        contained))
+	
 	
 	def _xml_content(self, defs):
 		text = self.text
@@ -8,6 +8,8 @@ scenegraph.element.use
 # imports ####################################################################
 
 from . import Element
+from ._bvh import _bounds, _parent_hull
+from ._batch import _draws
 
 
 # use ########################################################################
@@ -24,15 +26,38 @@ class Use(Element):
 		self.element = element
 		self._attributes.add("href")
 	
+	def __setattr__(self, attribute, value):
+		if attribute == "element" and value is not None:
+			value._link(self)
+		super(Use, self).__setattr__(attribute, value)
+	
 	@property
 	def href(self):
 		return self.element
 		
-	def _aabbox(self, transform, inheriteds):
-		return self.element.aabbox(transform, inheriteds)
+	def _aabbox(self, transform, inheriteds, exact=True):
+		return self.element.aabbox(transform, inheriteds, exact)
+	
+	def _local_hull(self, du2, inheriteds):
+		return _parent_hull(self.element, du2, inheriteds)
 	
 	def _render(self, transform, inheriteds, context):
 		self.element.render(transform, inheriteds, context)
 
 	def _pick_content(self, x, y, transform):
 		return self.element.pick(x, y, transform)
+	
+	def _pick_content_many(self, points, transform):
+		return self.element.pick_many(points, transform)
+	
+	def _pick_region_content(self, region, transform, contained):
+		return self.element.pick_region(region, transform, contained)
+	
+	def _local_bounds(self, du2):
+		return _bounds(self.element, du2)
+
+	def _draws_content(self, inheriteds, du2):
+		return _draws(self.element, inheriteds, du2)
+
+	def _tessellables_content(self, transform, inheriteds):
+		return self.element._tessellables(transform, inheriteds)
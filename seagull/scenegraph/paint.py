@@ -7,9 +7,12 @@ paint servers
 
 # imports ####################################################################
 
+from ctypes import c_void_p, sizeof
+
 from ..opengl import gl as _gl
 from ..opengl.utils import (get_opengl_version,
-                            create_shader, create_program, set_uniform)
+                            create_shader, create_program, set_uniform,
+                            create_ubo, update_ubo)
 from ._common import _Element
 
 from .transform import Translate, Matrix, Ortho, Shrink, product
@@ -18,7 +21,22 @@ from .transform import Translate, Matrix, Ortho, Shrink, product
 # shaders ####################################################################
 
 _ATTRIB_LOCATIONS = {
-	b"vertex": 0,
+	b"vertex":       0,
+	b"curve":        1,
+	b"extrusion":    2,
+	b"vertex_color": 3,
+	b"instance_x":   4,
+	b"instance_y":   5,
+}
+
+# values of attributes without array: curve coordinates default to the inside
+# of curves, no extrusion, white vertices and identity instance transform
+_ATTRIB_DEFAULTS = {
+	b"curve":        (0., 1., 0., 1.),
+	b"extrusion":    (0., 0., 0., 1.),
+	b"vertex_color": (1., 1., 1., 1.),
+	b"instance_x":   (1., 0., 0., 1.),
+	b"instance_y":   (0., 1., 0., 1.),
 }
 
 _VERT_SHADER = """
@@ -29,24 +47,41 @@ _VERT_SHADER = """
 	#endif
 	
 	attribute vec2 vertex;
+	attribute vec2 curve;
+	attribute vec2 extrusion;
+	attribute vec4 vertex_color;
+	attribute vec3 instance_x; // rows of the instance transform
+	attribute vec3 instance_y;
 	
 	uniform vec3 color;
 	uniform float alpha;
+	uniform float half_width;
 	
+	#if __VERSION__ >= 150
+	layout(std140) uniform transforms {
+		mat3 projection_transform;
+		mat3 modelview_transform;
+		mat3 paint_transform;
+	};
+	#else
 	uniform mat3 projection_transform;
 	uniform mat3 modelview_transform;
-	
 	uniform mat3 paint_transform;
+	#endif
 	uniform mat3 mask_transform;
 	
 	varying vec4 front_color;
 	varying vec2 paint_coord;
 	varying vec2 mask_coord;
+	varying vec2 curve_coord;
 	
 	void main() {
-		front_color = vec4(color, alpha);
-		vec3 pixel_position = modelview_transform * vec3(vertex, 1.);
-		paint_coord = (paint_transform * vec3(vertex, 1.)).xy;
+		front_color = vec4(color, alpha) * vertex_color;
+		curve_coord = curve;
+		vec3 position = vec3(vertex + half_width*extrusion, 1.);
+		paint_coord = (paint_transform * position).xy;
+		position = vec3(dot(instance_x, position), dot(instance_y, position), 1.);
+		vec3 pixel_position = modelview_transform * position;
 		mask_coord = (mask_transform * pixel_position).xy;
 		gl_Position = vec4((projection_transform * pixel_position).xy, 0., 1.);
 	}
@@ -68,6 +103,7 @@ _MAIN_FRAG_SHADER = """
 	
 	varying vec4 front_color;
 	varying vec2 mask_coord;
+	varying vec2 curve_coord;
 	
 	vec4 color(); // filling color
 	
@@ -79,7 +115,13 @@ _MAIN_FRAG_SHADER = """
 		return front_color * color;
 	}
 	
-	void main() { gl_FragColor = frag_color(); }
+	void main() {
+		// (u, v) curve coordinates, u*u > v outside quadric curves
+		if(curve_coord.x*curve_coord.x > curve_coord.y) {
+			discard;
+		}
+		gl_FragColor = frag_color();
+	}
 """
 
 
@@ -259,11 +301,66 @@ def _program(name):
 	except KeyError:
 		shaders = list(create_shader(*shader, MAX_STOPS=MAX_STOPS) for shader in _shaders[name])
 		program = _programs[name] = create_program(*shaders, attrib_locations=_ATTRIB_LOCATIONS)
+		for attrib in _ATTRIB_DEFAULTS:
+			_gl.DisableVertexAttribArray(_ATTRIB_LOCATIONS[attrib])
+			_gl.VertexAttrib4f(_ATTRIB_LOCATIONS[attrib], *_ATTRIB_DEFAULTS[attrib])
+		if _transforms_buffer():
+			index = _gl.GetUniformBlockIndex(program, b"transforms")
+			_gl.UniformBlockBinding(program, index, _TRANSFORMS_BINDING)
 	return program
 
 
-_current_kwargs = {}
+# transforms #################################################################
+
+_TRANSFORMS = ["projection_transform", "modelview_transform", "paint_transform"]
+_TRANSFORMS_BINDING = 0
+
+# std140 layout of the transforms block: each mat3 column is padded to a vec4
+_transforms_storage = (_gl.float * (12*len(_TRANSFORMS)))()
+_transforms_ubo = None
+_transforms_values = None
+
+def _transforms_buffer():
+	"""uniform buffer shared by programs for transforms (False if glsl < 150)."""
+	global _transforms_ubo
+	if _transforms_ubo is None:
+		if get_opengl_version() >= (3, 2):
+			_transforms_ubo = create_ubo(sizeof(_transforms_storage),
+			                             _TRANSFORMS_BINDING)
+		else:
+			_transforms_ubo = False
+	return _transforms_ubo
+
+def _set_matrix(program, uniforms, uniform, transform):
+	abcdef = transform.abcdef
+	if uniforms.get(uniform) != abcdef:
+		set_uniform(program, uniform, transform.uniform())
+		uniforms[uniform] = abcdef
+
+def _set_transforms(program, uniforms, transforms):
+	"""set projection, modelview and paint transforms.
+	
+	with a uniform buffer, the three are updated in a single copy shared by
+	all programs.
+	"""
+	global _transforms_values
+	if not _transforms_buffer():
+		for uniform, transform in zip(_TRANSFORMS, transforms):
+			_set_matrix(program, uniforms, uniform, transform)
+		return
+	values = tuple(transform.abcdef for transform in transforms)
+	if values != _transforms_values:
+		for i, (a, b, c, d, e, f) in enumerate(values):
+			_transforms_storage[12*i:12*i+12] = (a, b, 0., 0., c, d, 0., 0.,
+			                                     e, f, 1., 0.)
+		update_ubo(_transforms_ubo, _transforms_storage)
+		_transforms_values = values
+
+
+# uses #######################################################################
+
 _current_program = None
+_current_uniforms = {} # program -> values of its uniforms
 
 def _create(name, enable_sample_shading=True, **default_uniforms):
 	def set_sample_shading():
@@ -282,22 +379,30 @@ def _create(name, enable_sample_shading=True, **default_uniforms):
 			set_sample_shading = lambda: None
 		set_sample_shading()
 
-	def _use(**kwargs):
-		global _current_program, _current_uniforms
+	def _use(transforms, **kwargs):
+		"""use program, setting only the uniforms that changed.
+		
+		transforms are the projection, modelview and paint transforms.
+		"""
+		global _current_program
 		program = _program(name)
 		if _current_program != program:
 			_gl.UseProgram(program)
 			_current_program = program
-			_current_uniforms = {}
-		uniforms = dict(default_uniforms)
-		uniforms.update(kwargs)
-		uniforms["mask_transform"] = _MaskContext.transforms[-1].uniform()
-		uniforms["masking"] = [len(_MaskContext.textures) > 1]
-		for k in uniforms:
-			v = uniforms[k]
-			if v != _current_uniforms.get(k, None):
+		try:
+			uniforms = _current_uniforms[program]
+		except KeyError:
+			uniforms = _current_uniforms[program] = dict(default_uniforms)
+			for k in default_uniforms:
+				set_uniform(program, k, default_uniforms[k])
+		kwargs["masking"] = [len(_MaskContext.textures) > 1]
+		for k in kwargs:
+			v = kwargs[k]
+			if v != uniforms.get(k):
 				set_uniform(program, k, v)
-		_current_uniforms = uniforms
+				uniforms[k] = v
+		_set_matrix(program, uniforms, "mask_transform", _MaskContext.transforms[-1])
+		_set_transforms(program, uniforms, transforms)
 		set_sample_shading()
 	return _use
 
@@ -311,49 +416,224 @@ _use_pattern         = _create("pattern", mask_sampler=[1])
 
 # painting ##################################################################
 
-def _stencil_op(n, op):
-	_gl.StencilOp(_gl.KEEP, _gl.KEEP, op)
+def _draw_strip(n):
+	_gl.DrawArrays(_gl.TRIANGLE_STRIP, 0, n)
+
+def _draw_triangles(n):
+	_gl.DrawArrays(_gl.TRIANGLES, 0, n)
+
+def _draw_curves(counts):
+	"""draw the polygons strip then the curves triangles."""
+	n, m = counts
 	_gl.DrawArrays(_gl.TRIANGLE_STRIP, 0, n)
+	_gl.DrawArrays(_gl.TRIANGLES, n, m)
+
+def _cover_strip(n):
+	"""draw the bbox quad following the n stencil vertices."""
+	_gl.DrawArrays(_gl.TRIANGLE_STRIP, n, 4)
+
+def _cover_curves(counts):
+	"""draw the bbox quad following the polygons and curves."""
+	n, m = counts
+	_gl.DrawArrays(_gl.TRIANGLE_STRIP, n+m, 4)
+
+
+def _bind_vertices(vbo_id):
+	_gl.BindBuffer(_gl.ARRAY_BUFFER, vbo_id)
+	_gl.VertexAttribPointer(_ATTRIB_LOCATIONS[b"vertex"], 2, _gl.FLOAT,
+	                        False, 0, None)
+
+def _unbind_vertices():
+	pass
+
+def _make_binds(attrib, size=2):
+	"""bind/unbind vertices followed by size floats of attrib."""
+	location = _ATTRIB_LOCATIONS[attrib]
+	stride = (2+size)*4
+	def bind(vbo_id):
+		_gl.BindBuffer(_gl.ARRAY_BUFFER, vbo_id)
+		_gl.VertexAttribPointer(_ATTRIB_LOCATIONS[b"vertex"], 2, _gl.FLOAT,
+		                        False, stride, None)
+		_gl.VertexAttribPointer(location, size, _gl.FLOAT,
+		                        False, stride, c_void_p(2*4))
+		_gl.EnableVertexAttribArray(location)
+	def unbind():
+		_gl.DisableVertexAttribArray(location)
+		_gl.VertexAttrib4f(location, *_ATTRIB_DEFAULTS[attrib])
+	return bind, unbind
+
+_bind_curve_vertices,    _unbind_curve_vertices    = _make_binds(b"curve")
+_bind_extruded_vertices, _unbind_extruded_vertices = _make_binds(b"extrusion")
+_bind_colored_vertices,  _unbind_colored_vertices  = _make_binds(b"vertex_color", 4)
+
+# instances are rows (a, c, e, b, d, f) of their transform followed by rgba
+_INSTANCE_ATTRIBS = [(b"instance_x", 3, 0), (b"instance_y", 3, 3),
+                     (b"vertex_color", 4, 6)]
+_INSTANCE_STRIDE = 10*4
+
+def _make_instances_binds(colored):
+	"""bind/unbind vertices, and instances advancing once per instance.
+	
+	vbo ids are (vbo id, instances vbo id, first instance), instances colors
+	are only used if colored.
+	"""
+	attribs = _INSTANCE_ATTRIBS if colored else _INSTANCE_ATTRIBS[:2]
+	def bind(vbo_ids):
+		vbo_id, instances_id, first = vbo_ids
+		_bind_vertices(vbo_id)
+		_gl.BindBuffer(_gl.ARRAY_BUFFER, instances_id)
+		for attrib, size, offset in attribs:
+			location = _ATTRIB_LOCATIONS[attrib]
+			offset = first*_INSTANCE_STRIDE + offset*4
+			_gl.VertexAttribPointer(location, size, _gl.FLOAT,
+			                        False, _INSTANCE_STRIDE, c_void_p(offset))
+			_gl.VertexAttribDivisor(location, 1)
+			_gl.EnableVertexAttribArray(location)
+	def unbind():
+		for attrib, _, _ in attribs:
+			location = _ATTRIB_LOCATIONS[attrib]
+			_gl.VertexAttribDivisor(location, 0)
+			_gl.DisableVertexAttribArray(location)
+			_gl.VertexAttrib4f(location, *_ATTRIB_DEFAULTS[attrib])
+	return bind, unbind
+
+_bind_instances,         _unbind_instances         = _make_instances_binds(False)
+_bind_colored_instances, _unbind_colored_instances = _make_instances_binds(True)
+
+
+def _stencil_op(draw, n, op):
+	_gl.StencilOp(_gl.KEEP, _gl.KEEP, op)
+	draw(n)
 
 def _make_stencil(op):
-	def _stencil(n):
-		_stencil_op(n, op)
+	def _stencil(draw, n):
+		_stencil_op(draw, n, op)
 	return _stencil
 
+_stencil_keep    = _make_stencil(_gl.KEEP)
 _stencil_one     = _make_stencil(_gl.INCR)
 _stencil_evenodd = _make_stencil(_gl.INVERT)
 _stencil_replace = _make_stencil(_gl.REPLACE)
 
-def _stencil_nonzero(n):
+_two_sided_stencil = None # opengl >= 2.0, known at first nonzero stencil
+
+def _stencil_nonzero(draw, n):
+	"""increment on front faces and decrement on back faces
+	
+	with two sided stencil (opengl >= 2.0) in a single draw, otherwise with
+	a draw per culled face.
+	"""
+	global _two_sided_stencil
+	if _two_sided_stencil is None:
+		_two_sided_stencil = get_opengl_version() >= (2, 0)
+	if _two_sided_stencil:
+		_gl.StencilOpSeparate(_gl.FRONT, _gl.KEEP, _gl.KEEP, _gl.INCR_WRAP)
+		_gl.StencilOpSeparate(_gl.BACK,  _gl.KEEP, _gl.KEEP, _gl.DECR_WRAP)
+		draw(n)
+		return
 	_gl.Enable(_gl.CULL_FACE)
 	for cull, op in [(_gl.BACK,  _gl.INCR_WRAP),
 	                 (_gl.FRONT, _gl.DECR_WRAP)]:
 		_gl.CullFace(cull)
-		_stencil_op(n, op)
+		_stencil_op(draw, n, op)
 	_gl.Disable(_gl.CULL_FACE)
 
 
-def _make_paint(_stencil):
-	def paint(color, alpha, data, transform, context, origin, bbox):
+def _make_paint(_stencil, draw=_draw_strip, cover=_cover_strip,
+                bind=_bind_vertices, unbind=_unbind_vertices):
+	"""paint with a stencil pass then a cover pass, or a single color pass.
+	
+	the cover pass draws the bbox quad stored after the stencil geometry,
+	rather than the whole geometry again.
+	"""
+	if cover is not None:
+		passes = [(_gl.FALSE, _gl.ALWAYS,   _stencil,         draw),
+		          (_gl.TRUE,  _gl.NOTEQUAL, _stencil_replace, cover)]
+	else:
+		passes = [(_gl.TRUE,  _gl.ALWAYS,   _stencil,         draw)]
+	def paint(color, alpha, data, transform, context, origin, bbox,
+	          half_width=0.):
 		paint_transform = product(*color.transform).inverse() * \
 		                  color.units(origin, bbox)
 		projection_transform = Ortho(*context.orthos[-1])
-		color._use_program(color=[color.rgb], alpha=[float(alpha)],
-		                   modelview_transform=transform.uniform(),
-		                   paint_transform=paint_transform.uniform(),
-		                   projection_transform=projection_transform.uniform())
+		color._use_program(transforms=(projection_transform, transform,
+		                               paint_transform),
+		                   color=[color.rgb], alpha=[float(alpha)],
+		                   half_width=[float(half_width)])
 		n, vbo_id = data
-		_gl.BindBuffer(_gl.ARRAY_BUFFER, vbo_id)
-		_gl.VertexAttribPointer(_ATTRIB_LOCATIONS[b"vertex"], 2, _gl.FLOAT,
-		                        False, 0, None)
+		bind(vbo_id)
 		
-		for mask, func, stencil in [(_gl.FALSE, _gl.ALWAYS,   _stencil),
-		                            (_gl.TRUE,  _gl.NOTEQUAL, _stencil_replace)]:
+		for mask, func, stencil, draw in passes:
 			_gl.ColorMask(mask, mask, mask, mask)
 			_gl.StencilFunc(func, 0, -1)
-			stencil(n)
+			stencil(draw, n)
+		unbind()
 	return paint
 
+def _draw_batch_strips(draws):
+	"""draw the strips of a batch."""
+	firsts, counts, _, _ = draws
+	_gl.MultiDrawArrays(_gl.TRIANGLE_STRIP, firsts, counts, len(counts))
+
+def _draw_batch_triangles(draws):
+	"""draw the triangles of a batch."""
+	_, _, n, _ = draws
+	_gl.DrawArrays(_gl.TRIANGLES, 0, n)
+
+def _cover_batch(draws):
+	"""draw the cover triangles following the geometry of a batch."""
+	_, _, n, m = draws
+	_gl.DrawArrays(_gl.TRIANGLES, n, m)
+
+def _make_batch_paint(_stencil, draw=_draw_batch_strips, cover=_cover_batch):
+	"""paint of batched geometry with colored vertices.
+	
+	data is ((firsts, counts, n, m), vbo id) where firsts and counts locate
+	each draw in the n first vertices, followed by m cover vertices.
+	"""
+	return _make_paint(_stencil, draw, cover,
+	                   _bind_colored_vertices, _unbind_colored_vertices)
+
+def _draw_instanced_strip(counts):
+	"""draw the strip of all instances."""
+	n, instances = counts
+	_gl.DrawArraysInstanced(_gl.TRIANGLE_STRIP, 0, n, instances)
+
+def _draw_instanced_triangles(counts):
+	"""draw the triangles of all instances."""
+	n, instances = counts
+	_gl.DrawArraysInstanced(_gl.TRIANGLES, 0, n, instances)
+
+def _cover_instanced_strip(counts):
+	"""draw the bbox quads of all instances."""
+	n, instances = counts
+	_gl.DrawArraysInstanced(_gl.TRIANGLE_STRIP, n, 4, instances)
+
+def _make_instanced_paint(_stencil, draw=_draw_instanced_strip,
+                          cover=_cover_instanced_strip, colored=False):
+	"""paint of a geometry for many instances, transformed in vertex shader.
+	
+	data is ((n, count), (vbo id, instances vbo id, first)) where the n
+	vertices are followed by their bbox quad, and count instances are read
+	from first in the instances vbo. colored instances multiply the paint
+	by their color.
+	"""
+	if colored:
+		bind, unbind = _bind_colored_instances, _unbind_colored_instances
+	else:
+		bind, unbind = _bind_instances, _unbind_instances
+	return _make_paint(_stencil, draw, cover, bind, unbind)
+
+def _make_curves_paint(_stencil):
+	"""paint of polygons and quadric curves, resolved in fragment shader."""
+	return _make_paint(_stencil, _draw_curves, _cover_curves,
+	                   _bind_curve_vertices, _unbind_curve_vertices)
+
+def _make_extruded_paint(_stencil):
+	"""paint of strips extruded by half_width in vertex shader."""
+	return _make_paint(_stencil, _draw_strip, _cover_strip,
+	                   _bind_extruded_vertices, _unbind_extruded_vertices)
+
 
 # paint base class ###########################################################
 
@@ -387,6 +667,33 @@ class _Paint(_Element):
 	paint_one     = _make_paint(_stencil_one)
 	paint_evenodd = _make_paint(_stencil_evenodd)
 	paint_nonzero = _make_paint(_stencil_nonzero)
+	
+	paint_curves_evenodd = _make_curves_paint(_stencil_evenodd)
+	paint_curves_nonzero = _make_curves_paint(_stencil_nonzero)
+	
+	paint_extruded_one = _make_extruded_paint(_stencil_one)
+	
+	paint_triangles = _make_paint(_stencil_keep, _draw_triangles, cover=None)
+	
+	paint_batch_one       = _make_batch_paint(_stencil_one)
+	paint_batch_evenodd   = _make_batch_paint(_stencil_evenodd)
+	paint_batch_nonzero   = _make_batch_paint(_stencil_nonzero)
+	paint_batch_triangles = _make_batch_paint(_stencil_keep,
+	                                          _draw_batch_triangles, None)
+	
+	paint_instanced_one       = _make_instanced_paint(_stencil_one)
+	paint_instanced_evenodd   = _make_instanced_paint(_stencil_evenodd)
+	paint_instanced_nonzero   = _make_instanced_paint(_stencil_nonzero)
+	paint_instanced_triangles = _make_instanced_paint(_stencil_keep,
+	                                                  _draw_instanced_triangles, None)
+	
+	paint_colored_instanced_evenodd   = _make_instanced_paint(_stencil_evenodd,
+	                                                          colored=True)
+	paint_colored_instanced_nonzero   = _make_instanced_paint(_stencil_nonzero,
+	                                                          colored=True)
+	paint_colored_instanced_triangles = _make_instanced_paint(_stencil_keep,
+	                                                          _draw_instanced_triangles,
+	                                                          None, True)
 
 
 # solid color ################################################################
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests of seagull (run with python -m unittest discover)
+"""
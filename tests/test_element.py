@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests of scenegraph.element invalidation
+"""
+
+
+# imports ####################################################################
+
+import unittest
+
+import seagull.scenegraph as sg
+
+
+# tests ######################################################################
+
+class TestTransform(unittest.TestCase):
+	def setUp(self):
+		self.rect = sg.Rectangle(width=10., height=10.)
+		self.group = sg.Group([self.rect])
+		self.group.aabbox()
+		self.group.pick(5., 5.)
+	
+	def assertMoved(self):
+		self.assertEqual(self.group.aabbox(), ((100., 0.), (110., 10.)))
+		self.assertEqual(self.group.pick(5., 5.), [])
+		self.assertEqual(len(self.group.pick(105., 5.)), 1)
+	
+	def test_append(self):
+		self.rect.transform.append(sg.Translate(100., 0.))
+		self.assertMoved()
+	
+	def test_setitem(self):
+		self.rect.transform.append(sg.Translate(50., 0.))
+		self.group.aabbox()
+		self.rect.transform[0] = sg.Translate(100., 0.)
+		self.assertMoved()
+	
+	def test_assign(self):
+		self.rect.transform = [sg.Translate(100., 0.)]
+		self.assertMoved()
+
+
+
+class TestChildren(unittest.TestCase):
+	def setUp(self):
+		self.child = sg.Rectangle(width=10., height=10.)
+		self.group = sg.Group([self.child, sg.Rectangle(width=1., height=1.)])
+	
+	def assertLinked(self, linked=True):
+		self.group.aabbox()
+		self.child.width = 20.
+		self.assertEqual(self.group._valid, not linked)
+		parents = [parent() for parent in self.child._parents]
+		self.assertEqual(self.group in parents, linked)
+	
+	def test_linked(self):
+		self.assertLinked()
+	
+	def test_remove(self):
+		self.group.children.remove(self.child)
+		self.assertLinked(False)
+	
+	def test_pop(self):
+		self.group.children.pop(0)
+		self.assertLinked(False)
+	
+	def test_delitem(self):
+		del self.group.children[:1]
+		self.assertLinked(False)
+	
+	def test_setitem(self):
+		self.group.children[0] = sg.Group()
+		self.assertLinked(False)
+	
+	def test_clear(self):
+		self.group.children.clear()
+		self.assertLinked(False)
+	
+	def test_assign(self):
+		self.group.children = [sg.Group()]
+		self.assertLinked(False)
+		self.group.children = [self.child]
+		self.assertLinked()
+	
+	def test_duplicate(self):
+		self.group.children.append(self.child)
+		self.group.children.remove(self.child)
+		self.assertLinked()
+
+
+if __name__ == "__main__":
+	unittest.main()
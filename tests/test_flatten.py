@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests of cubic Bézier splines flattening
+"""
+
+
+# imports ####################################################################
+
+import unittest
+from math import hypot, sqrt
+from random import Random
+
+from seagull.scenegraph.element._path import _cubic, _TOLERANCE
+
+try:
+	from seagull.scenegraph.element import _path_numpy
+except ImportError:
+	_path_numpy = None
+
+
+# helpers ####################################################################
+
+def _cubics(n, size=100., seed=0):
+	rnd = Random(seed)
+	def p():
+		return rnd.uniform(0., size), rnd.uniform(0., size)
+	return [(p(), p(), p(), p()) for _ in range(n)]
+
+def _point(p0, p1, p2, p3, t):
+	"""exact point of cubic Bézier spline at t."""
+	s = 1.-t
+	a, b, c, d = s*s*s, 3.*s*s*t, 3.*s*t*t, t*t*t
+	return (a*p0[0] + b*p1[0] + c*p2[0] + d*p3[0],
+	        a*p0[1] + b*p1[1] + c*p2[1] + d*p3[1])
+
+def _distance(p, q0, q1):
+	"""distance of p to segment [q0, q1]."""
+	(x, y), (x0, y0), (x1, y1) = p, q0, q1
+	dx, dy = x1-x0, y1-y0
+	l2 = dx*dx + dy*dy
+	t = 0. if l2 == 0. else max(0., min(1., ((x-x0)*dx + (y-y0)*dy)/l2))
+	return hypot(x-x0-t*dx, y-y0-t*dy)
+
+
+# tests ######################################################################
+
+class TestCubic(unittest.TestCase):
+	du2s = [.01, 1., 100.]
+	
+	def test_tolerance(self):
+		for du2 in self.du2s:
+			tolerance = _TOLERANCE/sqrt(du2)
+			for cubic in _cubics(50):
+				points = [cubic[0]] + _cubic(*cubic, du2)
+				n = len(points)-1
+				for i, (q0, q1) in enumerate(zip(points, points[1:])):
+					x, y = _point(*cubic, t=i/n)
+					self.assertLess(hypot(q0[0]-x, q0[1]-y), 1e-6)
+					for k in range(9):
+						p = _point(*cubic, t=(i+k/8.)/n)
+						self.assertLessEqual(_distance(p, q0, q1), tolerance)
+	
+	@unittest.skipIf(_path_numpy is None, "numpy engine needs numpy")
+	def test_engines(self):
+		for du2 in self.du2s:
+			for p0, p1, p2, p3 in _cubics(50):
+				(path, _, _), = _path_numpy._flatten(["M", p0, "C", p1, p2, p3],
+				                                     du2)
+				points = [p0] + _cubic(p0, p1, p2, p3, du2)
+				self.assertEqual(len(path), len(points))
+				for (x, y), (x_, y_) in zip(path.tolist(), points):
+					self.assertAlmostEqual(x, x_, places=9)
+					self.assertAlmostEqual(y, y_, places=9)
+
+
+if __name__ == "__main__":
+	unittest.main()
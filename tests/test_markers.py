@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests of scenegraph.element.markers
+"""
+
+
+# imports ####################################################################
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import seagull.scenegraph as sg
+from seagull.scenegraph.element import markers, path, _batch
+from seagull.scenegraph.paint import _Paint
+from seagull.xml.serializer import serialize
+
+
+# helpers ####################################################################
+
+class _Context(object):
+	"""render context recording instanced paints, with fake vbos."""
+	
+	def __init__(self, test):
+		self.vbos, self.uploads, self.paints = {}, [], []
+		patches = [
+			mock.patch.object(markers, "create_vbo", self.create_vbo),
+			mock.patch.object(markers, "update_vbo", self.update_vbo),
+			mock.patch.object(path, "create_vbo", self.create_vbo),
+			mock.patch.object(_batch, "_instanced", True),
+		]
+		for name in dir(_Paint):
+			if "instanced" in name:
+				patches.append(mock.patch.object(_Paint, name, self.paint))
+		for patch in patches:
+			patch.start()
+			test.addCleanup(patch.stop)
+	
+	def create_vbo(self, *arrays):
+		vbo_id = len(self.vbos)+1
+		self.vbos[vbo_id] = np.concatenate([np.reshape(np.asarray(a, "f4"),
+		                                               (len(a), -1))
+		                                    for a in arrays])
+		return len(self.vbos[vbo_id]), vbo_id
+	
+	def update_vbo(self, vbo_id, first, rows):
+		self.uploads.append((first, len(rows)))
+		self.vbos[vbo_id][first:first+len(rows)] = rows
+	
+	def paint(self, alpha, data, *args):
+		(_, count), (_, _, first) = data
+		self.paints.append((first, count))
+
+
+def _random_markers(n, spread=100., seed=0, **attributes):
+	rnd = np.random.RandomState(seed)
+	positions = rnd.uniform(0., spread, (n, 2))
+	sizes = rnd.choice([1., 2., 8.], n)
+	colors = rnd.uniform(0., 1., (n, 3))
+	template = sg.Circle(r=1., **attributes)
+	return sg.Markers(template, positions, sizes, colors)
+
+
+# tests ######################################################################
+
+class TestRender(unittest.TestCase):
+	def setUp(self):
+		self.context = _Context(self)
+	
+	def rows(self, m):
+		buffer = m._buffer
+		return self.context.vbos[buffer.vbo_id][buffer.slots]
+	
+	def assertRows(self, m):
+		rows, instances = self.rows(m), m.instances
+		visible = instances["size"] > 0.
+		self.assertTrue(np.allclose(rows[visible][:, [0, 4]],
+		                            instances["size"][visible, None]))
+		self.assertTrue(np.allclose(rows[visible][:, [2, 5]],
+		                            instances["position"][visible]))
+		self.assertTrue(np.allclose(rows[visible][:, 6:],
+		                            instances["color"][visible]))
+	
+	def test_runs(self):
+		m = _random_markers(500, stroke=sg.Color.black)
+		m.render(context=self.context)
+		runs = m._buffer.runs
+		self.assertEqual(sum(count for _, _, count in runs), 500)
+		self.assertRows(m)
+	
+	def test_painter_order(self):
+		m = sg.Markers(sg.Circle(r=1.), [(0., 0.), (0., 0.), (0., 0.)],
+		               [1., 10., 1.])
+		m.render(context=self.context)
+		levels = [level for level, _, _ in m._buffer.runs]
+		self.assertEqual(len(levels), 3)
+		self.assertEqual(levels[0], levels[2])
+		self.assertNotEqual(levels[0], levels[1])
+		self.assertEqual(self.context.paints, [(0, 1), (1, 1), (2, 1)])
+	
+	def test_update_colors(self):
+		m = _random_markers(500)
+		m.render(context=self.context)
+		runs = m._buffer.runs
+		m.update(slice(10, 20), colors=[(1., 0., 0.)]*10)
+		m.update([30], colors=[(0., 1., 0., .5)])
+		m.render(context=self.context)
+		self.assertIs(m._buffer.runs, runs)
+		self.assertEqual(len(self.context.uploads), 1)
+		self.assertRows(m)
+	
+	def test_update_positions(self):
+		m = _random_markers(500)
+		m.render(context=self.context)
+		buffer = m._buffer
+		m.update(slice(0, 100), positions=m.instances["position"][:100]+50.)
+		m.render(context=self.context)
+		self.assertIs(m._buffer, buffer)
+		self.assertRows(m)
+	
+	def test_update_sizes(self):
+		m = _random_markers(500)
+		m.render(context=self.context)
+		buffer = m._buffer
+		m.update([0, 1], sizes=m.instances["size"][:2]*1.01)
+		m.render(context=self.context)
+		self.assertIs(m._buffer, buffer)
+		self.assertRows(m)
+		
+		# changing scale level
+		m.update(2, sizes=[m.instances["size"][2]*10.])
+		self.assertIsNone(m._buffer)
+		m.render(context=self.context)
+		self.assertIsNot(m._buffer, buffer)
+		self.assertRows(m)
+	
+	def test_hidden(self):
+		m = _random_markers(100)
+		m.update([3, 5], sizes=[0., float("nan")])
+		m.render(context=self.context)
+		self.assertEqual(sum(count for _, _, count in m._buffer.runs), 98)
+		self.assertEqual(sorted(np.flatnonzero(m._buffer.slots < 0)), [3, 5])
+
+
+class TestPicking(unittest.TestCase):
+	transform = sg.Matrix(2., 0., 0., 2., 10., 0.)
+	
+	def setUp(self):
+		self.markers = _random_markers(300, spread=200.)
+		self.markers.update([3, 5], sizes=[0., float("nan")])
+	
+	def instance_transforms(self):
+		m = self.markers
+		matrix = m._template().matrix()
+		for i, ((x, y), s) in enumerate(zip(m.instances["position"].tolist(),
+		                                    m.instances["size"].tolist())):
+			if s > 0.:
+				yield i, self.transform*sg.Matrix(s, 0., 0., s, x, y)*matrix
+	
+	def test_indices_at(self):
+		rnd = np.random.RandomState(1)
+		template = self.markers.template
+		for x, y in rnd.uniform(0., 400., (100, 2)).tolist():
+			expected = [i for i, transform in self.instance_transforms()
+			            if template._hit_test(x, y, transform)]
+			self.assertEqual(self.markers.indices_at(x, y, self.transform),
+			                 expected)
+	
+	def test_indices_in(self):
+		rnd = np.random.RandomState(2)
+		template = self.markers.template
+		for contained in (False, True):
+			for x, y in rnd.uniform(0., 400., (20, 2)).tolist():
+				region = [(x, y), (x+80., y+40.)]
+				polygon = [(x, y), (x+80., y), (x+80., y+40.), (x, y+40.)]
+				expected = [i for i, transform in self.instance_transforms()
+				            if template._region_test(polygon, transform, contained)]
+				self.assertEqual(self.markers.indices_in(region, self.transform,
+				                                         contained), expected)
+
+
+class TestMarkers(unittest.TestCase):
+	def test_serialize(self):
+		m = _random_markers(50)
+		m.update([3, 5], sizes=[0., float("nan")])
+		self.assertEqual(serialize(m).count("<use "), 48)
+	
+	def test_template(self):
+		template = sg.Circle(r=1.)
+		for wrong in (sg.Use(template), sg.Group([template])):
+			with self.assertRaises(TypeError):
+				sg.Markers(wrong)
+			m = sg.Markers(template)
+			with self.assertRaises(TypeError):
+				m.template = wrong
+
+
+if __name__ == "__main__":
+	unittest.main()